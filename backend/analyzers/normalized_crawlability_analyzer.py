@@ -36,6 +36,16 @@ class NormalizedCrawlabilityAnalyzer:
     def __init__(self):
         self.normalizer = EnvironmentNormalizer()
     
+    async def __aenter__(self) -> "NormalizedCrawlabilityAnalyzer":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    async def close(self) -> None:
+        """Close the normalizer's shared session and connection pool"""
+        await self.normalizer.close()
+    
     async def analyze(self, url: str) -> NormalizedModuleResult:
         """
         Perform normalized crawlability analysis
@@ -2,16 +2,18 @@
 Core analysis modules for the website analyzer
 """
 
-from .feature_extractor import FeatureExtractor
+from .feature_extractor import FeatureExtractor, FeatureBatch
 from .ai_analyzer import AIAnalyzer
 from .validation import URLValidator
-from .rate_limiter import RateLimiter
+from .rate_limiter import RateLimiter, RedisRateLimiter
 from .export_manager import ExportManager
 
 __all__ = [
     'FeatureExtractor',
+    'FeatureBatch',
     'AIAnalyzer',
     'URLValidator', 
     'RateLimiter',
+    'RedisRateLimiter',
     'ExportManager'
 ]
@@ -5,14 +5,123 @@ AI-powered website analysis using OpenAI GPT-4
 import asyncio
 import logging
 import json
+import operator
 import os
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import openai
 from models.schemas import CrawlabilityFeatures, AIAnalysisResult, Recommendation
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Static instructions live in the system message so every request shares an
+# identical prefix (eligible for OpenAI prompt caching); only the per-site
+# context is sent afterwards as the user message.
+_SYSTEM_PROMPT = """You are an expert SEO and web performance analyst.
+You will be given website analysis data. Analyze it and provide insights.
+
+Please provide:
+1. An overall crawlability score (0-100)
+2. Confidence level (0-1)
+3. A descriptive label (e.g., "Excellent", "Good", "Needs Improvement", "Poor")
+4. Top 5 specific recommendations with priority levels
+5. Brief explanation of key issues
+
+Respond in JSON format:
+{
+    "score": 85,
+    "confidence": 0.9,
+    "label": "Good",
+    "recommendations": [
+        {
+            "priority": "High",
+            "title": "Fix Title Tag",
+            "message": "Add a descriptive title tag",
+            "impact_score": 8
+        }
+    ],
+    "explanation": "Brief analysis summary"
+}
+
+Example input:
+Website Analysis Data:
+- URL: https://shop.example.org/
+- Status Code: 200
+- HTTPS Enabled: True
+- Title Present: True (Length: 72)
+- Meta Description: False (Length: 0)
+- H1 Count: 3
+- Page Load Time: 3.4s
+- HTML Size: 240512 bytes
+- Mobile Friendly: True
+- Images: 48 (Alt text: 12)
+- Internal Links: 135
+- External Links: 22
+- Robots.txt: True
+- Sitemap: False
+- Structured Data: False
+
+Rule-based Analysis:
+- Score: 58.5
+- Label: Needs Improvement
+- Category Scores: {'technical_seo': 0.4, 'crawlability': 0.7, 'performance': 0.45, 'mobile_friendliness': 1.0, 'security': 0.73, 'accessibility': 0.42}
+
+Example output:
+{
+    "score": 56,
+    "confidence": 0.85,
+    "label": "Needs Improvement",
+    "recommendations": [
+        {
+            "priority": "High",
+            "title": "Add Meta Description",
+            "message": "Write a unique 120-160 character meta description summarizing the page",
+            "impact_score": 8
+        },
+        {
+            "priority": "High",
+            "title": "Reduce Page Weight",
+            "message": "The 235KB HTML document and 3.4s load time slow crawling; defer non-critical markup and enable caching",
+            "impact_score": 8
+        },
+        {
+            "priority": "Medium",
+            "title": "Use a Single H1",
+            "message": "Consolidate the three H1 headings into one primary page heading",
+            "impact_score": 6
+        },
+        {
+            "priority": "Medium",
+            "title": "Publish an XML Sitemap",
+            "message": "Generate sitemap.xml and reference it from robots.txt",
+            "impact_score": 7
+        },
+        {
+            "priority": "Medium",
+            "title": "Add Alt Text to Images",
+            "message": "36 of 48 images are missing alternative text",
+            "impact_score": 6
+        }
+    ],
+    "explanation": "The page is reachable and mobile friendly, but missing metadata, a heavy document and no sitemap limit how efficiently it is crawled and indexed."
+}
+"""
+
+def features_to_columns(features_list: List[CrawlabilityFeatures], fields: List[str]) -> Dict[str, "np.ndarray"]:
+    """
+    Pack a batch of features into one NumPy column per field (structure of arrays)
+    """
+    return {
+        field: np.array([getattr(features, field) for features in features_list])
+        for field in fields
+    }
+
 class AIAnalyzer:
     """
     AI-powered website analysis using OpenAI GPT models
@@ -85,6 +194,25 @@ class AIAnalyzer:
                 ]
             }
         }
+        
+        # Precompiled attribute getters for every factor referenced above
+        self._factor_getters = {
+            factor: operator.attrgetter(factor)
+            for config in self.analysis_rules.values()
+            for factor in config['factors']
+        }
+        
+        # Factor order and category weights used by batch (columnar) scoring
+        self._batch_factors = list(self._factor_getters)
+        self._batch_categories = list(self.analysis_rules)
+        if NUMPY_AVAILABLE:
+            self._factor_mask = np.array([
+                [1.0 if factor in config['factors'] else 0.0 for factor in self._batch_factors]
+                for config in self.analysis_rules.values()
+            ])
+            self._category_weights = np.array([
+                config['weight'] for config in self.analysis_rules.values()
+            ])
     
     async def load_model(self):
         """Initialize OpenAI client and find available model"""
@@ -181,10 +309,64 @@ class AIAnalyzer:
             logger.error(f"❌ Analysis failed: {str(e)}")
             return self._create_fallback_result(features)
     
+    async def analyze_batch(self, features_list: List[CrawlabilityFeatures]) -> List[AIAnalysisResult]:
+        """
+        Rule-based analysis for many websites at once, scored column-wise
+        """
+        if not features_list:
+            return []
+        
+        if not NUMPY_AVAILABLE:
+            return [await self._rule_based_analysis(features) for features in features_list]
+        
+        try:
+            logger.info(f"🤖 Starting batch analysis for {len(features_list)} websites")
+            
+            columns = features_to_columns(features_list, self._batch_factors + ['images_count'])
+            factor_matrix = np.column_stack([
+                self._evaluate_factor_column(columns, factor) for factor in self._batch_factors
+            ])
+            
+            # (sites x factors) @ (factors x categories) -> per-category means
+            category_matrix = factor_matrix @ self._factor_mask.T / self._factor_mask.sum(axis=1)
+            overall_scores = category_matrix @ self._category_weights
+            
+            results = []
+            for features, category_row, overall_score in zip(features_list, category_matrix, overall_scores):
+                overall_score = float(overall_score)
+                scores = dict(zip(self._batch_categories, (float(v) for v in category_row)))
+                
+                recommendations = []
+                for category, category_score in scores.items():
+                    if category_score < 0.7:
+                        recommendations.extend(self._generate_category_recommendations(
+                            category, features, category_score
+                        ))
+                
+                results.append(AIAnalysisResult(
+                    score=overall_score * 100,
+                    confidence=self._calculate_confidence(features, overall_score),
+                    label=self._determine_label(overall_score),
+                    recommendations=recommendations[:10],
+                    category_scores=scores,
+                    analysis_method="rule_based"
+                ))
+            
+            logger.info(f"✅ Batch analysis completed for {len(results)} websites")
+            return results
+            
+        except Exception as e:
+            logger.error(f"❌ Batch analysis failed: {str(e)}")
+            return [await self._rule_based_analysis(features) for features in features_list]
+    
     async def _rule_based_analysis(self, features: CrawlabilityFeatures) -> AIAnalysisResult:
         """
         Perform rule-based analysis
         """
+        if not isinstance(features, CrawlabilityFeatures):
+            logger.error(f"❌ Rule-based analysis received invalid features: {type(features).__name__}")
+            return self._create_fallback_result(features)
+        
         try:
             scores = {}
             recommendations = []
@@ -232,42 +414,12 @@ class AIAnalyzer:
             # Prepare context for AI
             context = self._prepare_ai_context(features, rule_result)
             
-            # AI prompt
-            prompt = f"""
-            As an expert SEO and web performance analyst, analyze this website data and provide insights:
-
-            {context}
-
-            Please provide:
-            1. An overall crawlability score (0-100)
-            2. Confidence level (0-1)
-            3. A descriptive label (e.g., "Excellent", "Good", "Needs Improvement", "Poor")
-            4. Top 5 specific recommendations with priority levels
-            5. Brief explanation of key issues
-
-            Respond in JSON format:
-            {{
-                "score": 85,
-                "confidence": 0.9,
-                "label": "Good",
-                "recommendations": [
-                    {{
-                        "priority": "High",
-                        "title": "Fix Title Tag",
-                        "message": "Add a descriptive title tag",
-                        "impact_score": 8
-                    }}
-                ],
-                "explanation": "Brief analysis summary"
-            }}
-            """
-            
             # Call OpenAI API
             response = await openai.ChatCompletion.acreate(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are an expert SEO and web performance analyst."},
-                    {"role": "user", "content": prompt}
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": context}
                 ],
                 max_tokens=1000,
                 temperature=0.3,
@@ -309,71 +461,100 @@ class AIAnalyzer:
         """
         Calculate score for a specific category
         """
-        try:
-            total_score = 0.0
-            factor_count = len(factors)
-            
-            for factor in factors:
-                factor_score = self._evaluate_factor(features, factor)
-                total_score += factor_score
-            
-            return total_score / factor_count if factor_count > 0 else 0.0
-            
-        except Exception:
+        factor_count = len(factors)
+        if factor_count == 0:
             return 0.0
+        
+        total_score = 0.0
+        for factor in factors:
+            total_score += self._evaluate_factor(features, factor)
+        
+        return total_score / factor_count
     
     def _evaluate_factor(self, features: CrawlabilityFeatures, factor: str) -> float:
         """
         Evaluate individual factor
         """
         try:
+            value = self._factor_getters[factor](features)
+        except KeyError:
             value = getattr(features, factor, None)
-            
-            if value is None:
-                return 0.0
-            
-            # Boolean factors
-            if isinstance(value, bool):
-                return 1.0 if value else 0.0
-            
-            # Numeric factors with specific logic
-            if factor == 'status_code':
-                return 1.0 if value == 200 else 0.0
-            elif factor == 'h1_count':
-                return 1.0 if value == 1 else (0.5 if value > 1 else 0.0)
-            elif factor == 'page_load_time':
-                if value < 1.0:
-                    return 1.0
-                elif value < 2.0:
-                    return 0.8
-                elif value < 3.0:
-                    return 0.6
-                else:
-                    return 0.3
-            elif factor == 'html_size':
-                if value < 50000:  # 50KB
-                    return 1.0
-                elif value < 100000:  # 100KB
-                    return 0.8
-                elif value < 200000:  # 200KB
-                    return 0.6
-                else:
-                    return 0.3
-            elif factor == 'security_headers_count':
-                return min(value / 5.0, 1.0)  # Max 5 security headers
-            elif factor == 'images_with_alt_count':
-                total_images = getattr(features, 'images_count', 1)
-                return value / total_images if total_images > 0 else 1.0
-            elif factor == 'lazy_loading_images':
-                return min(value / 5.0, 1.0)  # Normalize to max 5 lazy images
-            elif factor == 'accessibility_score':
-                return value  # Already normalized 0-1
+        
+        if value is None:
+            return 0.0
+        
+        # Boolean factors
+        if isinstance(value, bool):
+            return 1.0 if value else 0.0
+        
+        # Numeric factors with specific logic
+        if factor == 'status_code':
+            return 1.0 if value == 200 else 0.0
+        elif factor == 'h1_count':
+            return 1.0 if value == 1 else (0.5 if value > 1 else 0.0)
+        elif factor == 'page_load_time':
+            if value < 1.0:
+                return 1.0
+            elif value < 2.0:
+                return 0.8
+            elif value < 3.0:
+                return 0.6
+            else:
+                return 0.3
+        elif factor == 'html_size':
+            if value < 50000:  # 50KB
+                return 1.0
+            elif value < 100000:  # 100KB
+                return 0.8
+            elif value < 200000:  # 200KB
+                return 0.6
             else:
-                # Default numeric handling
+                return 0.3
+        elif factor == 'security_headers_count':
+            return min(value / 5.0, 1.0)  # Max 5 security headers
+        elif factor == 'images_with_alt_count':
+            total_images = getattr(features, 'images_count', 1)
+            return value / total_images if total_images > 0 else 1.0
+        elif factor == 'lazy_loading_images':
+            return min(value / 5.0, 1.0)  # Normalize to max 5 lazy images
+        elif factor == 'accessibility_score':
+            return value  # Already normalized 0-1
+        else:
+            # Default numeric handling
+            try:
                 return min(float(value), 1.0)
-                
-        except Exception:
-            return 0.0
+            except (TypeError, ValueError):
+                return 0.0
+    
+    def _evaluate_factor_column(self, columns: Dict[str, "np.ndarray"], factor: str) -> "np.ndarray":
+        """
+        Vectorized counterpart of _evaluate_factor over a whole batch
+        """
+        value = columns[factor]
+        
+        # Boolean factors
+        if value.dtype == np.bool_:
+            return value.astype(np.float64)
+        
+        # Numeric factors with specific logic
+        if factor == 'status_code':
+            return (value == 200).astype(np.float64)
+        elif factor == 'h1_count':
+            return np.where(value == 1, 1.0, np.where(value > 1, 0.5, 0.0))
+        elif factor == 'page_load_time':
+            return np.select([value < 1.0, value < 2.0, value < 3.0], [1.0, 0.8, 0.6], default=0.3)
+        elif factor == 'html_size':
+            return np.select([value < 50000, value < 100000, value < 200000], [1.0, 0.8, 0.6], default=0.3)
+        elif factor in ('security_headers_count', 'lazy_loading_images'):
+            return np.minimum(value / 5.0, 1.0)
+        elif factor == 'images_with_alt_count':
+            total_images = columns['images_count']
+            return np.where(total_images > 0, value / np.maximum(total_images, 1), 1.0)
+        elif factor == 'accessibility_score':
+            return value.astype(np.float64)
+        else:
+            # Default numeric handling
+            return np.minimum(value.astype(np.float64), 1.0)
     
     def _generate_category_recommendations(self, category: str, features: CrawlabilityFeatures, score: float) -> List[Recommendation]:
         """
@@ -4,32 +4,126 @@ Advanced web crawler with multiple fallback strategies
 
 import asyncio
 import aiohttp
+import functools
+import random
 import logging
+import re
 import time
 import ssl
 import certifi
-from typing import Dict, Any, List, Optional
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup
-import re
-from datetime import datetime
+from urllib.robotparser import RobotFileParser
+import lxml.html
+from lxml import etree
+
+try:
+    import aiodns  # noqa: F401 - backs aiohttp's AsyncResolver
+    from aiohttp.resolver import AsyncResolver
+    AIODNS_AVAILABLE = True
+except ImportError:
+    AIODNS_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+def _parse_tree(content) -> lxml.html.HtmlElement:
+    """Parse HTML into an lxml document tree"""
+    try:
+        return lxml.html.document_fromstring(content)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        return lxml.html.document_fromstring(content.encode('utf-8'))
+    except etree.ParserError:
+        # Empty or whitespace-only document
+        return lxml.html.document_fromstring('<html></html>')
+
+def _permissive_ssl_context() -> ssl.SSLContext:
+    """Build an SSL context that skips verification so misconfigured sites can still be crawled"""
+    context = ssl.create_default_context(cafile=certifi.where())
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+# Loading the CA bundle is slow, so every crawler shares one context
+_SHARED_SSL_CTX_PERMISSIVE = _permissive_ssl_context()
+
+# Pages of one site share hosts and links, so repeated URLs are parsed once
+_urlparse = functools.lru_cache(maxsize=1024)(urlparse)
+
+# Body bytes read per chunk when streaming a page into the parser
+_STREAM_CHUNK_SIZE = 65536
+
+# Without a Content-Type charset, the body start is checked for a <meta> declaration
+# before choosing the parser encoding
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.I)
+_CHARSET_SNIFF_BYTES = 2048
+
+# Leading body bytes returned with the tree, enough for FeatureExtractor's byte-level checks
+_HTML_SAMPLE_SIZE = 65536
+
+def _decode_body(raw: bytes, encoding: Optional[str]) -> str:
+    """Decode a page body, falling back to utf-8 for encodings Python does not know"""
+    try:
+        return raw.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        return raw.decode('utf-8', errors='replace')
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 class WebCrawler:
     """
     Production-grade web crawler with multiple fallback strategies
     """
     
-    def __init__(self):
+    # Statuses worth retrying once every strategy has failed (rate limited / server errors)
+    _RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    
+    # XPath queries used by _parse_content, compiled once at class load
+    _XP_TITLE = etree.XPath('string((//title)[1])')
+    _XP_META_DESC = etree.XPath('string((//meta[@name="description"])[1]/@content)')
+    _XP_H1 = etree.XPath('//h1')
+    _XP_LINKS = etree.XPath('//a[@href]')
+    _XP_IMG = etree.XPath('//img[@src]')
+    _XP_SCRIPT = etree.XPath('//script/@src')
+    _XP_CSS = etree.XPath('//link[contains(concat(" ", normalize-space(@rel), " "), " stylesheet ")]/@href')
+    
+    def __init__(self, keep_html: bool = False, keep_tree: bool = False):
         self.timeout = aiohttp.ClientTimeout(total=30, connect=15)
+        
+        # Return the page HTML in results; off by default since callers use the extracted data
+        self.keep_html = keep_html
+        # Return the parsed lxml tree for FeatureExtractor; off by default so repeat crawls can be revalidated with 304s
+        self.keep_tree = keep_tree
+        
+        # Strategies run concurrently, so each gets a shorter timeout
+        self.strategy_timeout = aiohttp.ClientTimeout(total=10, connect=5)
+        
+        # Seconds to wait before launching each hedged fallback strategy
+        self.strategy_delays = {
+            'standard': 0.0,
+            'http_fallback': 2.0,
+            'user_agent': 3.0,
+            'user_agent_step': 0.5,
+            'minimal': 5.0
+        }
         self.max_retries = 3
-        self.retry_delay = 1.0
+        self.retry_delay = 0.25
+        # Longest Retry-After worth waiting for; beyond it the crawl gives up
+        self.max_retry_after = 10.0
         
-        # SSL context for secure connections
-        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
-        self.ssl_context.check_hostname = False
-        self.ssl_context.verify_mode = ssl.CERT_NONE
+        # SSL context for secure connections (shared, see _SHARED_SSL_CTX_PERMISSIVE)
+        self.ssl_context = _SHARED_SSL_CTX_PERMISSIVE
         
         # User agents for different strategies
         self.user_agents = [
@@ -39,46 +133,139 @@ class WebCrawler:
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
             "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:121.0) Gecko/20100101 Firefox/121.0"
         ]
+        
+        # Full browser-like headers for the standard strategy
+        self.standard_headers = {
+            'User-Agent': self.user_agents[0],
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Accept-Encoding': 'gzip, deflate, br',
+            'Connection': 'keep-alive',
+            'Upgrade-Insecure-Requests': '1',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Cache-Control': 'max-age=0'
+        }
+        
+        # Shared session (connection pool) reused by every strategy and check
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        
+        # URL -> (etag, last_modified, extracted fields without html/tree) for conditional GETs
+        self._etag_cache: Dict[str, Tuple[Optional[str], Optional[str], Dict[str, Any]]] = {}
+        self.etag_cache_size = 256
+        
+        # Netloc -> (robots.txt content, parsed rules), fetched once per site
+        self._robots_cache: Dict[str, Tuple[str, RobotFileParser]] = {}
+    
+    async def __aenter__(self) -> "WebCrawler":
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
     
-    async def crawl_website(self, url: str) -> Dict[str, Any]:
+    def _get_connector(self) -> aiohttp.TCPConnector:
+        """Return the shared connector, creating it on first use (it needs a running loop)"""
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                ssl=self.ssl_context,
+                resolver=AsyncResolver() if AIODNS_AVAILABLE else None,
+                use_dns_cache=True,
+                limit=100,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+                enable_cleanup_closed=True
+            )
+        return self._connector
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            # The connector outlives the session so its pool survives a session reset
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=self._get_connector(),
+                connector_owner=False
+            )
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the shared session and its connection pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+        self._connector = None
+    
+    async def crawl_website(self, url: str, keep_html: Optional[bool] = None,
+                            keep_tree: Optional[bool] = None) -> Dict[str, Any]:
         """
         Crawl website with multiple fallback strategies
+        
+        Strategies are hedged: each one is launched as soon as the strategy
+        before it fails or its staggered delay runs out, whichever comes first,
+        and the first to succeed wins. If they all fail with 429/5xx, the
+        standard strategy alone is retried (honoring Retry-After) up to
+        max_retries attempts in total. A HEAD probe is only tried once
+        every content strategy has failed. The page HTML is only returned
+        when keep_html (defaulting to the crawler's setting) is true.
+        
+        With keep_tree, successful results also carry the parsed lxml document
+        under 'tree' and the first 64 KiB of the body under 'html_sample', which
+        FeatureExtractor uses instead of parsing 'html' again. lxml
+        trees cannot be pickled or JSON-serialized, so drop 'tree' before
+        caching or sending such a result elsewhere. Previously crawled pages
+        are revalidated with conditional GETs (and served from the cached
+        fields on 304) when neither the HTML nor the tree is requested.
         """
         logger.info(f"🕷️ Starting crawl for: {url}")
         start_time = time.time()
+        delays = self.strategy_delays
+        if keep_html is None:
+            keep_html = self.keep_html
+        if keep_tree is None:
+            keep_tree = self.keep_tree
         
-        # Strategy 1: Standard HTTPS request
-        result = await self._try_standard_crawl(url)
-        if result['success']:
-            result['crawl_time'] = time.time() - start_time
-            result['strategy'] = 'standard'
-            return result
+        # (delay, name, strategy, *args) in priority order
+        strategies = [(delays['standard'], 'standard', self._try_standard_crawl, url, keep_html, keep_tree)]
         
-        # Strategy 2: HTTP fallback
         if url.startswith('https://'):
             http_url = url.replace('https://', 'http://')
-            result = await self._try_standard_crawl(http_url)
-            if result['success']:
-                result['crawl_time'] = time.time() - start_time
-                result['strategy'] = 'http_fallback'
-                return result
+            strategies.append((delays['http_fallback'], 'http_fallback', self._try_standard_crawl, http_url, keep_html, keep_tree))
         
-        # Strategy 3: Different user agents
         for i, user_agent in enumerate(self.user_agents):
-            result = await self._try_with_user_agent(url, user_agent)
-            if result['success']:
-                result['crawl_time'] = time.time() - start_time
-                result['strategy'] = f'user_agent_{i}'
-                return result
-        
-        # Strategy 4: Minimal headers
-        result = await self._try_minimal_request(url)
-        if result['success']:
+            strategies.append((
+                delays['user_agent'] + i * delays['user_agent_step'],
+                f'user_agent_{i}', self._try_with_user_agent, url, user_agent, keep_html, keep_tree
+            ))
+        
+        strategies.append((delays['minimal'], 'minimal', self._try_minimal_request, url, keep_html, keep_tree))
+        
+        result, failures = await self._hedge_strategies(strategies)
+        
+        # Transient server errors: retry once at crawl level rather than inside every strategy
+        attempt = 1
+        while result is None and attempt < self.max_retries:
+            delay = self._retry_delay_for(failures, attempt)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            attempt += 1
+            retried = await self._try_standard_crawl(url, keep_html, keep_tree)
+            if retried['success']:
+                retried.setdefault('strategy', 'standard')
+                result = retried
+            failures = [retried]
+        
+        if result is not None:
             result['crawl_time'] = time.time() - start_time
-            result['strategy'] = 'minimal'
             return result
         
-        # Strategy 5: HEAD request to check accessibility
+        # The HEAD probe returns no content, so it must never beat a content strategy
         result = await self._try_head_request(url)
         if result['success']:
             result['crawl_time'] = time.time() - start_time
@@ -94,167 +281,314 @@ class WebCrawler:
             'strategy': 'failed'
         }
     
-    async def _try_standard_crawl(self, url: str) -> Dict[str, Any]:
+    async def crawl_many(self, urls: List[str], max_concurrency: int = 20,
+                         keep_html: Optional[bool] = None, keep_tree: Optional[bool] = None) -> List[Any]:
+        """
+        Crawl several websites concurrently over the shared connection pool
+        
+        At most max_concurrency crawls run at once. Results are returned in the
+        order of urls; a crawl that raised is returned as its exception.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def _crawl_one(url: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.crawl_website(url, keep_html, keep_tree)
+        
+        return await asyncio.gather(*(_crawl_one(url) for url in urls), return_exceptions=True)
+    
+    async def _hedge_strategies(self, strategies: List[Tuple]) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Race the hedged strategies; return the winning result (or None) and the failed results"""
+        # failed[i] is set when strategy i fails, releasing strategy i + 1 early
+        failed = [asyncio.Event() for _ in strategies]
+        tasks = [
+            asyncio.create_task(self._run_strategy(
+                delay, failed[i - 1] if i else None, failed[i], name, strategy, *args
+            ))
+            for i, (delay, name, strategy, *args) in enumerate(strategies)
+        ]
+        pending = set(tasks)
+        failures = []
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                # Prefer the higher-priority strategy if several finish together
+                for task in sorted(done, key=tasks.index):
+                    name, result = task.result()
+                    if result['success']:
+                        result.setdefault('strategy', name)
+                        return result, failures
+                    failures.append(result)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        return None, failures
+    
+    def _retry_delay_for(self, failures: List[Dict[str, Any]], attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying a failed crawl, or None if it is not worth retrying
+        
+        Only 429/5xx failures are retried. The longest Retry-After they carry is
+        honored (up to max_retry_after); otherwise the wait backs off
+        exponentially from retry_delay with a little jitter.
+        """
+        retryable = [f for f in failures if f.get('status_code') in self._RETRY_STATUSES]
+        if not retryable:
+            return None
+        
+        retry_after = [f['retry_after'] for f in retryable if f.get('retry_after') is not None]
+        if retry_after:
+            wait = max(retry_after)
+            return wait if wait <= self.max_retry_after else None
+        return self.retry_delay * 2 ** (attempt - 1) + random.random() * 0.1
+    
+    async def _run_strategy(self, delay: float, previous_failed: Optional[asyncio.Event],
+                            failed: asyncio.Event, name: str, strategy, *args) -> Tuple[str, Dict[str, Any]]:
+        """Run a single crawl strategy once the previous one fails or its hedging delay runs out"""
+        if delay > 0:
+            try:
+                if previous_failed is None:
+                    await asyncio.sleep(delay)
+                else:
+                    await asyncio.wait_for(previous_failed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        
+        result = {'success': False}
+        try:
+            result = await strategy(*args)
+            return name, result
+        finally:
+            if not result.get('success'):
+                failed.set()
+    
+    def _conditional_headers(self, url: str, headers: Optional[Dict[str, str]] = None,
+                             keep_html: bool = False, keep_tree: bool = False) -> Dict[str, str]:
+        """Add If-None-Match / If-Modified-Since validators for previously crawled URLs"""
+        cached = self._etag_cache.get(url)
+        if cached is None or keep_html or keep_tree:
+            # Nothing cached, or the cache cannot supply the requested HTML / tree
+            return headers or {}
+        
+        etag, last_modified, _ = cached
+        headers = dict(headers or {})
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+    
+    def _remember_result(self, url: str, response, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache a result's extracted fields alongside its validators so unchanged pages can be revalidated"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if result.get('success') and (etag or last_modified):
+            self._etag_cache.pop(url, None)
+            if len(self._etag_cache) >= self.etag_cache_size:
+                # Evict the oldest entry
+                self._etag_cache.pop(next(iter(self._etag_cache)))
+            # The HTML and tree are too large to keep around just to answer 304s
+            fields = {key: value for key, value in result.items() if key not in ('html', 'tree', 'html_sample')}
+            self._etag_cache[url] = (etag, last_modified, fields)
+        return result
+    
+    def _cached_result(self, url: str) -> Dict[str, Any]:
+        """Return the cached extracted fields for a 304 Not Modified response"""
+        result = dict(self._etag_cache[url][2])
+        result['html'] = None
+        result['tree'] = None
+        result['html_sample'] = None
+        result['strategy'] = 'cached_304'
+        return result
+    
+    async def _try_standard_crawl(self, url: str, keep_html: bool = False, keep_tree: bool = False) -> Dict[str, Any]:
         """Standard crawl with full headers"""
         try:
-            headers = {
-                'User-Agent': self.user_agents[0],
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Cache-Control': 'max-age=0'
-            }
-            
-            async with aiohttp.ClientSession(
-                timeout=self.timeout,
-                headers=headers,
-                connector=aiohttp.TCPConnector(ssl=self.ssl_context)
-            ) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        return await self._parse_content(url, content, response)
-                    else:
-                        return {
-                            'success': False,
-                            'error': f'HTTP {response.status}',
-                            'status_code': response.status
-                        }
+            return await self._fetch_page(url, self.standard_headers, keep_html, keep_tree)
                         
         except Exception as e:
             logger.warning(f"⚠️ Standard crawl failed for {url}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    async def _try_with_user_agent(self, url: str, user_agent: str) -> Dict[str, Any]:
+    async def _try_with_user_agent(self, url: str, user_agent: str, keep_html: bool = False,
+                                   keep_tree: bool = False) -> Dict[str, Any]:
         """Try with specific user agent"""
         try:
-            headers = {'User-Agent': user_agent}
-            
-            async with aiohttp.ClientSession(
-                timeout=self.timeout,
-                headers=headers,
-                connector=aiohttp.TCPConnector(ssl=self.ssl_context)
-            ) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        return await self._parse_content(url, content, response)
-                    else:
-                        return {'success': False, 'error': f'HTTP {response.status}'}
+            return await self._fetch_page(url, {'User-Agent': user_agent}, keep_html, keep_tree)
                         
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    async def _try_minimal_request(self, url: str) -> Dict[str, Any]:
+    async def _try_minimal_request(self, url: str, keep_html: bool = False, keep_tree: bool = False) -> Dict[str, Any]:
         """Try with minimal headers"""
         try:
-            async with aiohttp.ClientSession(
-                timeout=self.timeout,
-                connector=aiohttp.TCPConnector(ssl=self.ssl_context)
-            ) as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        return await self._parse_content(url, content, response)
-                    else:
-                        return {'success': False, 'error': f'HTTP {response.status}'}
+            return await self._fetch_page(url, None, keep_html, keep_tree)
                         
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    async def _fetch_page(self, url: str, headers: Optional[Dict[str, str]], keep_html: bool,
+                          keep_tree: bool = False) -> Dict[str, Any]:
+        """GET and parse a page once over the shared session"""
+        session = await self._get_session()
+        headers = self._conditional_headers(url, headers, keep_html, keep_tree)
+        async with session.get(url, headers=headers, timeout=self.strategy_timeout) as response:
+            if response.status == 304 and url in self._etag_cache:
+                return self._cached_result(url)
+            if response.status == 200:
+                tree, raw, html_sample, html_size = await self._stream_document(response, keep_html)
+                return self._remember_result(url, response, await self._parse_content(
+                    url, raw, response, tree, keep_html, html_size, keep_tree, html_sample
+                ))
+            else:
+                return {
+                    'success': False,
+                    'error': f'HTTP {response.status}',
+                    'status_code': response.status,
+                    'retry_after': _parse_retry_after(response.headers.get('Retry-After'))
+                }
+    
     async def _try_head_request(self, url: str) -> Dict[str, Any]:
         """Try HEAD request to check if site is accessible"""
         try:
-            async with aiohttp.ClientSession(
-                timeout=self.timeout,
-                connector=aiohttp.TCPConnector(ssl=self.ssl_context)
-            ) as session:
-                async with session.head(url) as response:
-                    if response.status == 200:
-                        # Site is accessible, return minimal data
-                        return {
-                            'success': True,
-                            'html': '',
-                            'status_code': response.status,
-                            'headers': dict(response.headers),
-                            'url': str(response.url),
-                            'title': '',
-                            'meta_description': '',
-                            'h1_tags': [],
-                            'links': [],
-                            'images': [],
-                            'scripts': [],
-                            'stylesheets': []
-                        }
-                    else:
-                        return {'success': False, 'error': f'HTTP {response.status}'}
+            session = await self._get_session()
+            async with session.head(url, timeout=self.strategy_timeout) as response:
+                if response.status == 200:
+                    # Site is accessible, return minimal data
+                    return {
+                        'success': True,
+                        'html': '',
+                        'tree': None,
+                        'html_sample': None,
+                        'status_code': response.status,
+                        'headers': dict(response.headers),
+                        'url': str(response.url),
+                        'title': '',
+                        'meta_description': '',
+                        'h1_tags': [],
+                        'links': [],
+                        'images': [],
+                        'scripts': [],
+                        'stylesheets': []
+                    }
+                else:
+                    return {'success': False, 'error': f'HTTP {response.status}'}
                         
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    async def _parse_content(self, url: str, content: str, response) -> Dict[str, Any]:
-        """Parse HTML content and extract data"""
-        try:
-            soup = BeautifulSoup(content, 'html.parser')
+    def _stream_encoding(self, response, head: bytes) -> Optional[str]:
+        """Pick the parser encoding: the header charset, else lxml's own <meta> detection, else utf-8"""
+        if response.charset:
+            return response.charset
+        if _META_CHARSET_RE.search(head, 0, _CHARSET_SNIFF_BYTES):
+            return None
+        return 'utf-8'
+    
+    async def _stream_document(self, response, keep_html: bool = False
+                               ) -> Tuple[lxml.html.HtmlElement, Optional[bytes], bytes, int]:
+        """
+        Feed the (auto-decompressed) body into lxml chunk by chunk as it arrives
+        
+        Returns the tree, the raw body (only when keep_html, otherwise None so
+        no more than a chunk and the leading sample are held alongside the
+        tree), the first _HTML_SAMPLE_SIZE bytes and the body size.
+        """
+        parser = None
+        head = b''
+        sample = b''
+        chunks = [] if keep_html else None
+        size = 0
+        async for chunk in response.content.iter_chunked(_STREAM_CHUNK_SIZE):
+            size += len(chunk)
+            if chunks is not None:
+                chunks.append(chunk)
+            if len(sample) < _HTML_SAMPLE_SIZE:
+                sample += chunk[:_HTML_SAMPLE_SIZE - len(sample)]
             
-            # Extract basic information
-            title = soup.find('title')
-            title_text = title.get_text().strip() if title else ''
+            if parser is not None:
+                parser.feed(chunk)
+                continue
             
-            # Meta description
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            meta_description = meta_desc.get('content', '').strip() if meta_desc else ''
+            # Hold back the first bytes until the encoding can be chosen
+            head += chunk
+            if len(head) >= _CHARSET_SNIFF_BYTES:
+                parser = lxml.html.HTMLParser(encoding=self._stream_encoding(response, head))
+                parser.feed(head)
+                head = b''
+        
+        if parser is None and head:
+            # Body shorter than the sniffing window
+            parser = lxml.html.HTMLParser(encoding=self._stream_encoding(response, head))
+            parser.feed(head)
+        
+        tree = None
+        if parser is not None:
+            try:
+                tree = parser.close()
+            except etree.XMLSyntaxError:
+                pass
+        if tree is None:
+            # Empty body
+            tree = _parse_tree('<html></html>')
+        
+        return tree, b''.join(chunks) if chunks is not None else None, sample, size
+    
+    async def _parse_content(self, url: str, raw: Optional[bytes], response,
+                             tree: Optional[lxml.html.HtmlElement] = None,
+                             keep_html: bool = False, html_size: Optional[int] = None,
+                             keep_tree: bool = False, html_sample: Optional[bytes] = None) -> Dict[str, Any]:
+        """Parse HTML content and extract data (raw may be None when a tree is given and keep_html is off)"""
+        try:
+            content = None
+            if keep_html or tree is None:
+                # Decode with the encoding the parser settled on, including <meta> declarations
+                encoding = response.charset or (tree.getroottree().docinfo.encoding if tree is not None else None)
+                content = _decode_body(raw, encoding)
+            if tree is None:
+                tree = _parse_tree(content)
             
-            # H1 tags
-            h1_tags = [h1.get_text().strip() for h1 in soup.find_all('h1')]
+            # Extract basic information
+            title_text = self._XP_TITLE(tree).strip()
+            meta_description = self._XP_META_DESC(tree).strip()
+            h1_tags = [h1.text_content().strip() for h1 in self._XP_H1(tree)]
             
-            # Links
+            # Links (base domain resolved once for the internal check)
+            base_netloc = _urlparse(url).netloc
             links = []
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                absolute_url = urljoin(url, href)
+            for link in self._XP_LINKS(tree):
+                absolute_url = urljoin(url, link.get('href'))
                 links.append({
                     'url': absolute_url,
-                    'text': link.get_text().strip(),
-                    'internal': self._is_internal_link(url, absolute_url)
+                    'text': link.text_content().strip(),
+                    'internal': _urlparse(absolute_url).netloc == base_netloc
                 })
             
             # Images
-            images = []
-            for img in soup.find_all('img'):
-                src = img.get('src', '')
-                if src:
-                    absolute_url = urljoin(url, src)
-                    images.append({
-                        'src': absolute_url,
-                        'alt': img.get('alt', ''),
-                        'title': img.get('title', '')
-                    })
-            
-            # Scripts
-            scripts = []
-            for script in soup.find_all('script'):
-                src = script.get('src')
-                if src:
-                    absolute_url = urljoin(url, src)
-                    scripts.append(absolute_url)
+            images = [
+                {
+                    'src': urljoin(url, src),
+                    'alt': img.get('alt', ''),
+                    'title': img.get('title', '')
+                }
+                for img in self._XP_IMG(tree)
+                if (src := img.get('src'))
+            ]
             
-            # Stylesheets
-            stylesheets = []
-            for link in soup.find_all('link', rel='stylesheet'):
-                href = link.get('href')
-                if href:
-                    absolute_url = urljoin(url, href)
-                    stylesheets.append(absolute_url)
+            # Scripts and stylesheets
+            scripts = [urljoin(url, src) for src in self._XP_SCRIPT(tree) if src]
+            stylesheets = [urljoin(url, href) for href in self._XP_CSS(tree) if href]
             
             return {
                 'success': True,
-                'html': content,
+                'html': content if keep_html else None,
+                'tree': tree if keep_tree else None,
+                'html_sample': (raw[:_HTML_SAMPLE_SIZE] if html_sample is None else html_sample) if keep_tree else None,
                 'status_code': response.status,
                 'headers': dict(response.headers),
                 'url': str(response.url),
@@ -265,95 +599,84 @@ class WebCrawler:
                 'images': images,
                 'scripts': scripts,
                 'stylesheets': stylesheets,
-                'word_count': len(content.split()),
-                'html_size': len(content.encode('utf-8'))
+                'word_count': len(tree.text_content().split()),
+                'html_size': len(raw) if html_size is None else html_size
             }
             
         except Exception as e:
             logger.error(f"❌ Content parsing failed: {str(e)}")
             return {'success': False, 'error': f'Content parsing failed: {str(e)}'}
     
-    def _is_internal_link(self, base_url: str, link_url: str) -> bool:
-        """Check if link is internal"""
-        try:
-            base_domain = urlparse(base_url).netloc
-            link_domain = urlparse(link_url).netloc
-            return base_domain == link_domain
-        except:
-            return False
-    
     async def check_robots_txt(self, url: str) -> Dict[str, Any]:
         """Check robots.txt file"""
         try:
-            parsed_url = urlparse(url)
-            robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
-            
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
+            parsed_url = _urlparse(url)
+            cached = self._robots_cache.get(parsed_url.netloc)
+            if cached is None:
+                robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+                
+                session = await self._get_session()
                 async with session.get(robots_url) as response:
-                    if response.status == 200:
-                        content = await response.text()
-                        
-                        # Check if robots.txt blocks crawling
-                        blocks_crawling = self._check_robots_blocking(content)
-                        
-                        return {
-                            'exists': True,
-                            'content': content,
-                            'blocks_crawling': blocks_crawling
-                        }
-                    else:
+                    if response.status != 200:
                         return {'exists': False, 'blocks_crawling': False}
+                    content = await response.text()
+                
+                cached = (content, self._parse_robots(content))
+                self._robots_cache[parsed_url.netloc] = cached
+            
+            content, robots = cached
+            return {
+                'exists': True,
+                'content': content,
+                'blocks_crawling': not robots.can_fetch('*', url),
+                'crawl_delay': robots.crawl_delay('*')
+            }
                         
         except Exception as e:
             logger.warning(f"⚠️ Robots.txt check failed: {str(e)}")
             return {'exists': False, 'blocks_crawling': False}
     
-    def _check_robots_blocking(self, robots_content: str) -> bool:
-        """Check if robots.txt blocks crawling"""
-        try:
-            lines = robots_content.lower().split('\n')
-            current_user_agent = None
-            
-            for line in lines:
-                line = line.strip()
-                if line.startswith('user-agent:'):
-                    current_user_agent = line.split(':', 1)[1].strip()
-                elif line.startswith('disallow:') and current_user_agent in ['*', 'googlebot']:
-                    disallow_path = line.split(':', 1)[1].strip()
-                    if disallow_path == '/':
-                        return True
-            
-            return False
-            
-        except Exception:
-            return False
+    def _parse_robots(self, robots_content: str) -> RobotFileParser:
+        """Parse robots.txt rules with the stdlib parser"""
+        robots = RobotFileParser()
+        robots.parse(robots_content.splitlines())
+        return robots
     
     async def check_sitemap(self, url: str) -> Dict[str, Any]:
         """Check for XML sitemap"""
         try:
-            parsed_url = urlparse(url)
+            parsed_url = _urlparse(url)
             sitemap_urls = [
                 f"{parsed_url.scheme}://{parsed_url.netloc}/sitemap.xml",
                 f"{parsed_url.scheme}://{parsed_url.netloc}/sitemap_index.xml",
                 f"{parsed_url.scheme}://{parsed_url.netloc}/sitemaps.xml"
             ]
             
-            for sitemap_url in sitemap_urls:
-                async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                    try:
-                        async with session.get(sitemap_url) as response:
-                            if response.status == 200:
-                                content = await response.text()
-                                return {
-                                    'exists': True,
-                                    'url': sitemap_url,
-                                    'content': content[:1000]  # First 1000 chars
-                                }
-                    except:
-                        continue
+            session = await self._get_session()
+            results = await asyncio.gather(
+                *(self._fetch_sitemap(session, sitemap_url) for sitemap_url in sitemap_urls),
+                return_exceptions=True
+            )
+            
+            # Report the first candidate (in priority order) that exists
+            for result in results:
+                if isinstance(result, dict):
+                    return result
             
             return {'exists': False}
             
         except Exception as e:
             logger.warning(f"⚠️ Sitemap check failed: {str(e)}")
             return {'exists': False}
+    
+    async def _fetch_sitemap(self, session: aiohttp.ClientSession, sitemap_url: str) -> Optional[Dict[str, Any]]:
+        """Fetch one sitemap candidate, returning None if it is not served"""
+        async with session.get(sitemap_url) as response:
+            if response.status != 200:
+                return None
+            content = await response.text()
+            return {
+                'exists': True,
+                'url': sitemap_url,
+                'content': content[:1000]  # First 1000 chars
+            }
@@ -4,19 +4,83 @@ Environment normalizer for consistent crawlability analysis across different env
 
 import asyncio
 import aiohttp
+import bisect
+import hashlib
+import re
 import ssl
 import certifi
 import time
 import statistics
-from typing import Dict, List, Any, Optional
-from bs4 import BeautifulSoup
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from bs4 import BeautifulSoup, FeatureNotFound
 import logging
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import aiodns  # noqa: F401 - backs aiohttp's AsyncResolver
+    from aiohttp.resolver import AsyncResolver
+    AIODNS_AVAILABLE = True
+except ImportError:
+    AIODNS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+def _strict_ssl_context() -> ssl.SSLContext:
+    """Build a fully verifying SSL context from certifi's CA bundle"""
+    context = ssl.create_default_context(cafile=certifi.where())
+    context.check_hostname = True
+    context.verify_mode = ssl.CERT_REQUIRED
+    return context
+
+# Loading the CA bundle is slow, so every normalizer shares one context
+_SHARED_SSL_CTX_STRICT = _strict_ssl_context()
+
+# Markup stripped before counting words on the raw body bytes
+_TAG_RE = re.compile(rb'<[^>]+>')
+
+def _parse_html(content) -> BeautifulSoup:
+    """Parse HTML with lxml, falling back to html.parser if lxml is unavailable or fails"""
+    try:
+        return BeautifulSoup(content, 'lxml')
+    except FeatureNotFound:
+        return BeautifulSoup(content, 'html.parser')
+    except Exception as e:
+        logger.warning(f"lxml parsing failed, falling back to html.parser: {e}")
+        return BeautifulSoup(content, 'html.parser')
+
+def _parse_document(content):
+    """Parse HTML with selectolax's lexbor engine, falling back to BeautifulSoup"""
+    if SELECTOLAX_AVAILABLE:
+        try:
+            return LexborHTMLParser(content)
+        except Exception as e:
+            logger.warning(f"Lexbor parsing failed, falling back to BeautifulSoup: {e}")
+    return _parse_html(content)
+
 class EnvironmentNormalizer:
     """Normalizes environment differences for consistent analysis"""
     
+    # Hrefs with these prefixes are not counted as internal links
+    _EXTERNAL_HREF_PREFIXES = ('http://', 'https://', 'mailto:', 'tel:')
+    
+    # Score lookup tables: a value up to and including threshold i scores SCORES[i]
+    _LOAD_THRESHOLDS = [1.0, 2.0, 3.0, 5.0]
+    _LOAD_SCORES = [15, 12, 8, 4, 0]
+    _SIZE_THRESHOLDS_MB = [0.5, 1.0, 2.0, 5.0]
+    _SIZE_SCORES = [10, 8, 5, 2, 0]
+    
     def __init__(self):
         self.standardized_headers = {
             "User-Agent": "Mozilla/5.0 (compatible; WebAnalyzer/2.0; +https://example.com/bot)",
@@ -28,27 +92,84 @@ class EnvironmentNormalizer:
             "Pragma": "no-cache"
         }
         
-        # SSL context for consistency
-        self.ssl_context = ssl.create_default_context(cafile=certifi.where())
-        self.ssl_context.check_hostname = True
-        self.ssl_context.verify_mode = ssl.CERT_REQUIRED
+        # SSL context for consistency (shared, see _SHARED_SSL_CTX_STRICT)
+        self.ssl_context = _SHARED_SSL_CTX_STRICT
+        
+        # Number of concurrent samples taken per normalized crawl
+        self.attempt_count = 3
+        
+        # Shared session reused across attempts and crawls
+        self.timeout = aiohttp.ClientTimeout(total=10, connect=5)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        
+        # URL -> (etag, last_modified, features / status / load time) for conditional GETs
+        self._etag_cache: Dict[str, Tuple[Optional[str], Optional[str], Dict[str, Any]]] = {}
+        self.etag_cache_size = 256
+        
+        # Content digest -> parsed document, so identical bodies are parsed once
+        self._parse_cache: "OrderedDict[bytes, Any]" = OrderedDict()
+        self.parse_cache_size = 8
+    
+    async def __aenter__(self) -> "EnvironmentNormalizer":
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    def _get_connector(self) -> aiohttp.TCPConnector:
+        """Return the shared connector, creating it on first use (it needs a running loop)"""
+        if self._connector is None or self._connector.closed:
+            self._connector = aiohttp.TCPConnector(
+                ssl=self.ssl_context,
+                resolver=AsyncResolver() if AIODNS_AVAILABLE else None,
+                use_dns_cache=True,
+                limit=100,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                keepalive_timeout=30,
+                enable_cleanup_closed=True
+            )
+        return self._connector
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            # The connector outlives the session so its pool survives a session reset
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=self._get_connector(),
+                connector_owner=False
+            )
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the shared session and its connection pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._connector is not None and not self._connector.closed:
+            await self._connector.close()
+        self._connector = None
     
     async def normalized_crawl(self, url: str) -> Dict[str, Any]:
         """Perform normalized crawl with consistent results"""
         try:
             logger.info(f"🔧 Starting normalized crawl for: {url}")
             
-            # Multiple attempts for stability
-            attempts = []
+            # Multiple concurrent attempts for stability
+            results = await asyncio.gather(
+                *(self._single_crawl_attempt(url) for _ in range(self.attempt_count)),
+                return_exceptions=True
+            )
             
-            for attempt in range(3):
-                try:
-                    result = await self._single_crawl_attempt(url)
-                    if result.get('success'):
-                        attempts.append(result)
-                except Exception as e:
-                    logger.warning(f"Attempt {attempt + 1} failed: {e}")
-                    continue
+            attempts = []
+            for attempt, result in enumerate(results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"Attempt {attempt + 1} failed: {result}")
+                elif result.get('success'):
+                    attempts.append(result)
             
             if not attempts:
                 return {
@@ -72,58 +193,113 @@ class EnvironmentNormalizer:
     
     async def _single_crawl_attempt(self, url: str) -> Dict[str, Any]:
         """Single crawl attempt with standardized configuration"""
-        connector = aiohttp.TCPConnector(ssl=self.ssl_context)
-        timeout = aiohttp.ClientTimeout(total=10, connect=5)
+        session = await self._get_session()
+        headers = self.standardized_headers
+        cached = self._etag_cache.get(url)
+        if cached is not None:
+            etag, last_modified, _ = cached
+            headers = dict(headers)
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
         
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            start_time = time.time()
-            
-            async with session.get(url, headers=self.standardized_headers) as response:
-                content = await response.read()
+        start_time = time.time()
+        
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and cached is not None:
+                # Unchanged page: reuse the cached parse, only the timing is new
                 load_time = time.time() - start_time
-                
-                # Parse content
-                soup = BeautifulSoup(content, 'html.parser')
-                
-                # Extract features
-                features = self._extract_normalized_features(soup, content, load_time)
-                
-                return {
-                    'success': True,
-                    'content': content,
-                    'soup': soup,
-                    'load_time': load_time,
-                    'features': features,
+                return self._revalidated_attempt(cached[2], load_time)
+            
+            content = await response.read()
+            load_time = time.time() - start_time
+            
+            # Parse content (memoized on the body bytes)
+            document = self._parse_cached(content)
+            
+            # Extract features
+            features = self._extract_normalized_features(document, content, load_time)
+            
+            result = {
+                'success': True,
+                'content': content,
+                'document': document,
+                'load_time': load_time,
+                'features': features,
+                'status_code': response.status,
+                'response_headers': dict(response.headers)
+            }
+            
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if response.status == 200 and (etag or last_modified):
+                self._etag_cache.pop(url, None)
+                if len(self._etag_cache) >= self.etag_cache_size:
+                    # Evict the oldest entry
+                    self._etag_cache.pop(next(iter(self._etag_cache)))
+                # Only what a 304 needs; the body and parsed document are not worth keeping around
+                self._etag_cache[url] = (etag, last_modified, {
+                    'features': dict(features),
                     'status_code': response.status,
-                    'response_headers': dict(response.headers)
-                }
+                    'load_time': load_time
+                })
+            
+            return result
     
-    def _extract_normalized_features(self, soup: BeautifulSoup, content: bytes, load_time: float) -> Dict[str, Any]:
-        """Extract normalized features from content"""
-        # Basic content features
-        title = soup.find('title')
-        title_text = title.get_text().strip() if title else ""
+    def _parse_cached(self, content: bytes):
+        """Parse content, reusing the document of an identical body parsed recently"""
+        key = hashlib.blake2b(content, digest_size=16).digest()
+        document = self._parse_cache.get(key)
+        if document is not None:
+            self._parse_cache.move_to_end(key)
+            return document
         
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        meta_desc_text = meta_desc.get('content', '').strip() if meta_desc else ""
+        document = _parse_document(content)
+        self._parse_cache[key] = document
+        if len(self._parse_cache) > self.parse_cache_size:
+            self._parse_cache.popitem(last=False)
+        return document
+    
+    def _revalidated_attempt(self, cached: Dict[str, Any], load_time: float) -> Dict[str, Any]:
+        """Build an attempt result from cached features after a 304 Not Modified"""
+        normalized_load_time = min(load_time, 5.0)
+        features = dict(cached['features'])
+        features['load_time'] = normalized_load_time
+        features['load_time_score'] = self._calculate_load_time_score(normalized_load_time)
         
-        # Count elements
-        h1_count = len(soup.find_all('h1'))
-        h2_count = len(soup.find_all('h2'))
-        img_count = len(soup.find_all('img'))
-        link_count = len(soup.find_all('a'))
-        internal_links = len([a for a in soup.find_all('a', href=True) if not a['href'].startswith(('http://', 'https://', 'mailto:', 'tel:'))])
+        return {
+            'success': True,
+            'load_time': load_time,
+            'features': features,
+            'status_code': cached['status_code'],
+            'cached': True
+        }
+    
+    def _extract_normalized_features(self, document, content: bytes, load_time: float) -> Dict[str, Any]:
+        """Extract normalized features from content"""
+        if isinstance(document, BeautifulSoup):
+            counts = self._collect_soup_counts(document)
+        else:
+            counts = self._collect_lexbor_counts(document)
+        
+        title_text = counts['title_text']
+        meta_desc_text = counts['meta_desc_text']
+        h1_count = counts['h1_count']
+        h2_count = counts['h2_count']
+        img_count = counts['img_count']
+        link_count = counts['link_count']
+        internal_links = counts['internal_links']
         
-        # Text content
-        text_content = soup.get_text()
-        word_count = len(text_content.split())
+        # Text content (approximate: whitespace tokens of the tag-stripped bytes)
+        word_count = len(_TAG_RE.sub(b' ', content).split())
         
         # Technical features
-        has_viewport = bool(soup.find('meta', attrs={'name': 'viewport'}))
+        has_viewport = counts['has_viewport']
         has_ssl = True  # We're using HTTPS for the test URL
         
         # Image accessibility
-        images_with_alt = len([img for img in soup.find_all('img') if img.get('alt')])
+        images_with_alt = counts['images_with_alt']
         alt_ratio = images_with_alt / img_count if img_count > 0 else 1.0
         
         # Security headers (simplified check)
@@ -174,6 +350,46 @@ class EnvironmentNormalizer:
             'content_size_score': content_size_score
         }
     
+    def _collect_lexbor_counts(self, tree) -> Dict[str, Any]:
+        """Collect raw element counts from a selectolax (lexbor) tree"""
+        title = tree.css_first('title')
+        meta_desc = tree.css_first('meta[name="description"]')
+        images = tree.css('img')
+        internal_links = 0
+        for a in tree.css('a[href]'):
+            if not (a.attributes.get('href') or '').startswith(self._EXTERNAL_HREF_PREFIXES):
+                internal_links += 1
+        
+        return {
+            'title_text': title.text().strip() if title else "",
+            'meta_desc_text': (meta_desc.attributes.get('content') or '').strip() if meta_desc else "",
+            'h1_count': len(tree.css('h1')),
+            'h2_count': len(tree.css('h2')),
+            'img_count': len(images),
+            'link_count': len(tree.css('a')),
+            'internal_links': internal_links,
+            'has_viewport': tree.css_first('meta[name="viewport"]') is not None,
+            'images_with_alt': sum(1 for img in images if img.attributes.get('alt'))
+        }
+    
+    def _collect_soup_counts(self, soup: BeautifulSoup) -> Dict[str, Any]:
+        """Collect raw element counts from a BeautifulSoup document"""
+        title = soup.find('title')
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        images = soup.find_all('img')
+        
+        return {
+            'title_text': title.get_text().strip() if title else "",
+            'meta_desc_text': meta_desc.get('content', '').strip() if meta_desc else "",
+            'h1_count': len(soup.find_all('h1')),
+            'h2_count': len(soup.find_all('h2')),
+            'img_count': len(images),
+            'link_count': len(soup.find_all('a')),
+            'internal_links': len([a for a in soup.find_all('a', href=True) if not a['href'].startswith(self._EXTERNAL_HREF_PREFIXES)]),
+            'has_viewport': bool(soup.find('meta', attrs={'name': 'viewport'})),
+            'images_with_alt': len([img for img in images if img.get('alt')])
+        }
+    
     def _calculate_content_score(self, title_len: int, desc_len: int, word_count: int, h1_count: int) -> float:
         """Calculate content quality score (0-35)"""
         score = 0
@@ -236,31 +452,12 @@ class EnvironmentNormalizer:
     
     def _calculate_load_time_score(self, load_time: float) -> float:
         """Calculate load time score (0-15)"""
-        if load_time <= 1.0:
-            return 15
-        elif load_time <= 2.0:
-            return 12
-        elif load_time <= 3.0:
-            return 8
-        elif load_time <= 5.0:
-            return 4
-        else:
-            return 0
+        return self._LOAD_SCORES[bisect.bisect_left(self._LOAD_THRESHOLDS, load_time)]
     
     def _calculate_content_size_score(self, content_size: int) -> float:
         """Calculate content size score (0-10)"""
         size_mb = content_size / (1024 * 1024)
-        
-        if size_mb <= 0.5:
-            return 10
-        elif size_mb <= 1.0:
-            return 8
-        elif size_mb <= 2.0:
-            return 5
-        elif size_mb <= 5.0:
-            return 2
-        else:
-            return 0
+        return self._SIZE_SCORES[bisect.bisect_left(self._SIZE_THRESHOLDS_MB, size_mb)]
     
     def _normalize_results(self, attempts: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Normalize results from multiple attempts using median values"""
@@ -275,20 +472,42 @@ class EnvironmentNormalizer:
             'load_time_score', 'content_size_score'
         ]
         
-        # Calculate median values
-        median_features = {}
-        for feature in numeric_features:
-            values = [attempt['features'][feature] for attempt in attempts if feature in attempt['features']]
-            if values:
-                median_features[feature] = statistics.median(values)
-        
-        # Use the attempt closest to median load time as base
-        load_times = [attempt['features']['load_time'] for attempt in attempts]
-        median_load_time = statistics.median(load_times)
-        base_attempt = min(attempts, key=lambda x: abs(x['features']['load_time'] - median_load_time))
+        if NUMPY_AVAILABLE and all(feature in attempt['features'] for attempt in attempts for feature in numeric_features):
+            median_features, base_attempt = self._median_features_numpy(attempts, numeric_features)
+        else:
+            # Calculate median values
+            median_features = {}
+            for feature in numeric_features:
+                values = [attempt['features'][feature] for attempt in attempts if feature in attempt['features']]
+                if values:
+                    median_features[feature] = statistics.median(values)
+            
+            # Use the attempt closest to median load time as base
+            load_times = [attempt['features']['load_time'] for attempt in attempts]
+            median_load_time = statistics.median(load_times)
+            base_attempt = min(attempts, key=lambda x: abs(x['features']['load_time'] - median_load_time))
         
         # Update with median values
         result = base_attempt.copy()
         result['features'].update(median_features)
         
         return result
+    
+    def _median_features_numpy(self, attempts: List[Dict[str, Any]], numeric_features: List[str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Take every feature median in one pass and pick the attempt closest to the median load time"""
+        arr = np.array(
+            [[attempt['features'][feature] for feature in numeric_features] for attempt in attempts],
+            dtype=np.float64
+        )
+        medians = np.median(arr, axis=0)
+        
+        # Keep integer features integral where the median allows it (as statistics.median does)
+        median_features = {}
+        for feature, value in zip(numeric_features, medians.tolist()):
+            if isinstance(attempts[0]['features'][feature], int) and value.is_integer():
+                value = int(value)
+            median_features[feature] = value
+        
+        load_times = arr[:, numeric_features.index('load_time')]
+        base_idx = int(np.argmin(np.abs(load_times - np.median(load_times))))
+        return median_features, attempts[base_idx]
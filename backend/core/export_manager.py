@@ -4,33 +4,137 @@ Export manager for generating reports in various formats
 
 import asyncio
 import logging
+import os
 import json
 import csv
+import functools
 import io
-from typing import Dict, Any, List
+from typing import Dict, Any, IO, List
 from datetime import datetime
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
+from pydantic import BaseModel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Report styles are immutable once built, so they are shared by every report
+_STYLES = getSampleStyleSheet()
+
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=24,
+    spaceAfter=30,
+    textColor=colors.darkblue
+)
+
+# Paragraph markup for one PDF recommendation
+_REC_TPL = "<b>{i}. {title}</b><br/>Priority: {priority}<br/>{message}".format
+
+# Score and confidence cells in the PDF info table
+_PERCENT_FMT = "{:.1f}%".format
+
+# Static part of the JSON report metadata
+_REPORT_META_TEMPLATE = {
+    "format_version": "1.0",
+    "generator": "Neurom AI Website Analyzer"
+}
+
+def _csv_escape(value: Any) -> str:
+    """Quote a CSV field the way csv.writer's QUOTE_MINIMAL does, only when needed"""
+    if value is None:
+        return ''
+    text = str(value)
+    if ',' in text or '"' in text or '\n' in text or '\r' in text:
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+@functools.lru_cache(maxsize=512)
+def _metric_label(key: str) -> str:
+    """Human-readable label for a feature key (feature keys repeat across reports)"""
+    return key.replace('_', ' ').title()
+
+def _featurize(features: Dict[str, Any]):
+    """Yield (label, value) CSV rows for the features that have a value"""
+    return ((_metric_label(key), str(value)) for key, value in features.items() if value is not None)
+
+def _yes_no(value: Any) -> str:
+    """Format a boolean feature for the report"""
+    return 'Yes' if value else 'No'
+
+# Technical-details rows: (label, feature key, default, formatter)
+_METRIC_SPEC = (
+    ('Status Code', 'status_code', 'Unknown', str),
+    ('HTTPS Enabled', 'https_enabled', False, _yes_no),
+    ('Page Load Time', 'page_load_time', 0, '{:.2f}s'.format),
+    ('HTML Size', 'html_size', 0, '{:,} bytes'.format),
+    ('Word Count', 'word_count', 0, '{:,}'.format),
+    ('Images Count', 'images_count', 0, str),
+    ('Internal Links', 'internal_links_count', 0, str),
+    ('External Links', 'external_links_count', 0, str),
+    ('Mobile Friendly', 'mobile_friendly', False, _yes_no),
+    ('Robots.txt Exists', 'robots_txt_exists', False, _yes_no)
+)
+
+_INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('BACKGROUND', (1, 0), (1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+_TECH_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+def _json_default(obj: Any) -> Any:
+    """Serialize values neither JSON encoder handles natively"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        # Schemas (e.g. CrawlabilityFeatures) are dumped by pydantic-core, not field by field
+        return obj.model_dump(mode='json')
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 class ExportManager:
     """
     Generate reports in PDF, CSV, and JSON formats
     """
     
+    # Reports with fewer recommendation + feature rows than this are built inline;
+    # below it a thread hop costs more than the build itself
+    INLINE_REPORT_ROWS = 32
+    
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.darkblue
-        )
+        self.styles = _STYLES
+        
+        # Report building is synchronous CPU work; run it here so it doesn't block the event loop
+        self._report_executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix='report')
         
         logger.info("📊 Export manager initialized")
     
@@ -39,162 +143,147 @@ class ExportManager:
         Generate PDF report from analysis data
         """
         try:
-            logger.info("📄 Generating PDF report")
-            
-            # Create PDF buffer
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4)
-            story = []
-            
-            # Title
-            title = Paragraph("Website Analysis Report", self.title_style)
-            story.append(title)
-            story.append(Spacer(1, 20))
-            
-            # Basic information
-            url = analysis_data.get('url', 'Unknown')
-            timestamp = analysis_data.get('timestamp', datetime.now().isoformat())
-            score = analysis_data.get('crawlability_score', 0)
-            
-            info_data = [
-                ['Website URL:', url],
-                ['Analysis Date:', timestamp],
-                ['Overall Score:', f"{score:.1f}%"],
-                ['Confidence:', f"{analysis_data.get('confidence', 0) * 100:.1f}%"],
-                ['Label:', analysis_data.get('label', 'Unknown')]
-            ]
+            logger.info("📄 Generating PDF report for %s", analysis_data.get('url', 'Unknown'))
             
-            info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-            info_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(info_table)
-            story.append(Spacer(1, 20))
-            
-            # Recommendations
-            recommendations = analysis_data.get('recommendations', [])
-            if recommendations:
-                rec_title = Paragraph("Recommendations", self.styles['Heading2'])
-                story.append(rec_title)
-                story.append(Spacer(1, 10))
-                
-                for i, rec in enumerate(recommendations[:10], 1):
-                    rec_text = f"<b>{i}. {rec.get('title', 'Unknown')}</b><br/>"
-                    rec_text += f"Priority: {rec.get('priority', 'Medium')}<br/>"
-                    rec_text += f"{rec.get('message', 'No description available')}"
-                    
-                    rec_para = Paragraph(rec_text, self.styles['Normal'])
-                    story.append(rec_para)
-                    story.append(Spacer(1, 10))
-            
-            # Technical details
-            features = analysis_data.get('features', {})
-            if features:
-                tech_title = Paragraph("Technical Details", self.styles['Heading2'])
-                story.append(tech_title)
-                story.append(Spacer(1, 10))
-                
-                # Create table of key metrics
-                tech_data = [['Metric', 'Value']]
-                
-                key_metrics = [
-                    ('Status Code', features.get('status_code', 'Unknown')),
-                    ('HTTPS Enabled', 'Yes' if features.get('https_enabled') else 'No'),
-                    ('Page Load Time', f"{features.get('page_load_time', 0):.2f}s"),
-                    ('HTML Size', f"{features.get('html_size', 0):,} bytes"),
-                    ('Word Count', f"{features.get('word_count', 0):,}"),
-                    ('Images Count', features.get('images_count', 0)),
-                    ('Internal Links', features.get('internal_links_count', 0)),
-                    ('External Links', features.get('external_links_count', 0)),
-                    ('Mobile Friendly', 'Yes' if features.get('mobile_friendly') else 'No'),
-                    ('Robots.txt Exists', 'Yes' if features.get('robots_txt_exists') else 'No')
-                ]
-                
-                for metric, value in key_metrics:
-                    tech_data.append([metric, str(value)])
-                
-                tech_table = Table(tech_data, colWidths=[3*inch, 2*inch])
-                tech_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 12),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                
-                story.append(tech_table)
-            
-            # Build PDF
-            doc.build(story)
-            buffer.seek(0)
+            pdf_content = await self._build_report(self._build_pdf_sync, analysis_data, analysis_data)
             
             logger.info("✅ PDF report generated successfully")
-            return buffer.getvalue()
+            return pdf_content
             
         except Exception as e:
             logger.error(f"❌ PDF generation failed: {str(e)}")
             raise
     
-    async def generate_csv_report(self, analysis_data: Dict[str, Any]) -> str:
+    async def stream_pdf_report(self, analysis_data: Dict[str, Any], sink: IO[bytes]) -> None:
         """
-        Generate CSV report from analysis data
+        Render the PDF report straight into a binary file-like sink
+        
+        Nothing is buffered here, so a large report never has to be held in
+        memory as one bytes object (e.g. pass a SpooledTemporaryFile that a
+        streaming response then drains). Rendering runs on the report executor.
         """
         try:
-            logger.info("📊 Generating CSV report")
+            logger.info("📄 Streaming PDF report for %s", analysis_data.get('url', 'Unknown'))
             
-            output = io.StringIO()
-            writer = csv.writer(output)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._report_executor, self._render_pdf, analysis_data, sink)
             
-            # Header
-            writer.writerow(['Website Analysis Report'])
-            writer.writerow([])
+            logger.info("✅ PDF report streamed successfully")
             
-            # Basic info
-            writer.writerow(['Basic Information'])
-            writer.writerow(['URL', analysis_data.get('url', 'Unknown')])
-            writer.writerow(['Analysis Date', analysis_data.get('timestamp', '')])
-            writer.writerow(['Overall Score', f"{analysis_data.get('crawlability_score', 0):.1f}%"])
-            writer.writerow(['Confidence', f"{analysis_data.get('confidence', 0) * 100:.1f}%"])
-            writer.writerow(['Label', analysis_data.get('label', 'Unknown')])
-            writer.writerow([])
+        except Exception as e:
+            logger.error(f"❌ PDF streaming failed: {str(e)}")
+            raise
+    
+    async def generate_all(self, analysis_data: Dict[str, Any]) -> Dict[str, bytes]:
+        """
+        Generate the PDF, CSV and JSON reports concurrently
+        """
+        pdf_content, csv_content, json_content = await asyncio.gather(
+            self.generate_pdf_report(analysis_data),
+            self.generate_csv_report(analysis_data),
+            self.generate_json_report(analysis_data)
+        )
+        return {'pdf': pdf_content, 'csv': csv_content, 'json': json_content}
+    
+    async def _build_report(self, builder, data: Dict[str, Any], analysis_data: Dict[str, Any]):
+        """Run a report builder inline for small reports, otherwise off the event loop"""
+        rows = len(analysis_data.get('recommendations') or []) + len(analysis_data.get('features') or {})
+        if rows < self.INLINE_REPORT_ROWS:
+            return builder(data)
+        
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._report_executor, builder, data)
+    
+    def _build_pdf_sync(self, analysis_data: Dict[str, Any]) -> bytes:
+        """Render the PDF report into a buffer and return its bytes (blocking)"""
+        buffer = io.BytesIO()
+        self._render_pdf(analysis_data, buffer)
+        
+        return buffer.getvalue()
+    
+    def _render_pdf(self, analysis_data: Dict[str, Any], sink: IO[bytes]) -> None:
+        """Lay out and render the PDF report into a binary file-like sink (blocking)"""
+        doc = BaseDocTemplate(sink, pagesize=A4)
+        # One page template for every page; reports have no first-page layout or page callbacks
+        doc.addPageTemplates([
+            PageTemplate(id='main', frames=[Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')])
+        ])
+        story = []
+        
+        # Title
+        title = Paragraph("Website Analysis Report", _TITLE_STYLE)
+        story.append(title)
+        story.append(Spacer(1, 20))
+        
+        # Basic information
+        url = analysis_data.get('url', 'Unknown')
+        timestamp = analysis_data.get('timestamp', datetime.now().isoformat())
+        score = analysis_data.get('crawlability_score', 0)
+        
+        info_data = [
+            ['Website URL:', url],
+            ['Analysis Date:', timestamp],
+            ['Overall Score:', _PERCENT_FMT(score)],
+            ['Confidence:', _PERCENT_FMT(analysis_data.get('confidence', 0) * 100)],
+            ['Label:', analysis_data.get('label', 'Unknown')]
+        ]
+        
+        info_table = Table(info_data, colWidths=[2*inch, 4*inch], style=_INFO_TABLE_STYLE)
+        
+        story.append(info_table)
+        story.append(Spacer(1, 20))
+        
+        heading_style = self.styles['Heading2']
+        normal_style = self.styles['Normal']
+        
+        # Recommendations
+        recommendations = analysis_data.get('recommendations', [])
+        if recommendations:
+            rec_title = Paragraph("Recommendations", heading_style)
+            story.append(rec_title)
+            story.append(Spacer(1, 10))
             
-            # Recommendations
-            recommendations = analysis_data.get('recommendations', [])
-            if recommendations:
-                writer.writerow(['Recommendations'])
-                writer.writerow(['Priority', 'Title', 'Message'])
+            for i, rec in enumerate(islice(recommendations, 10), 1):
+                rec_text = _REC_TPL(
+                    i=i,
+                    title=rec.get('title', 'Unknown'),
+                    priority=rec.get('priority', 'Medium'),
+                    message=rec.get('message', 'No description available')
+                )
                 
-                for rec in recommendations:
-                    writer.writerow([
-                        rec.get('priority', 'Medium'),
-                        rec.get('title', 'Unknown'),
-                        rec.get('message', 'No description')
-                    ])
-                writer.writerow([])
-            
-            # Technical features
-            features = analysis_data.get('features', {})
-            if features:
-                writer.writerow(['Technical Details'])
-                writer.writerow(['Metric', 'Value'])
-                
-                for key, value in features.items():
-                    if value is not None:
-                        writer.writerow([key.replace('_', ' ').title(), str(value)])
+                rec_para = Paragraph(rec_text, normal_style)
+                story.append(rec_para)
+                story.append(Spacer(1, 10))
+        
+        # Technical details
+        features = analysis_data.get('features', {})
+        if features:
+            tech_title = Paragraph("Technical Details", heading_style)
+            story.append(tech_title)
+            story.append(Spacer(1, 10))
+            
+            # Create table of key metrics
+            tech_data = [['Metric', 'Value']] + [
+                [label, fmt(features.get(key, default))] for label, key, default, fmt in _METRIC_SPEC
+            ]
+            
+            tech_table = Table(tech_data, colWidths=[3*inch, 2*inch], style=_TECH_TABLE_STYLE)
+            
+            story.append(tech_table)
+        
+        # Build PDF
+        doc.build(story)
+    
+    async def generate_csv_report(self, analysis_data: Dict[str, Any]) -> bytes:
+        """
+        Generate CSV report from analysis data
+        
+        Returned as UTF-8 bytes, ready to be sent as a response body.
+        """
+        try:
+            logger.info("📊 Generating CSV report for %s", analysis_data.get('url', 'Unknown'))
             
-            csv_content = output.getvalue()
-            output.close()
+            csv_content = await self._build_report(self._build_csv_sync, analysis_data, analysis_data)
             
             logger.info("✅ CSV report generated successfully")
             return csv_content
@@ -203,24 +292,70 @@ class ExportManager:
             logger.error(f"❌ CSV generation failed: {str(e)}")
             raise
     
-    async def generate_json_report(self, analysis_data: Dict[str, Any]) -> str:
+    def _build_csv_sync(self, analysis_data: Dict[str, Any]) -> bytes:
+        """Write the CSV report (blocking)"""
+        # Encode while writing so the report is produced as UTF-8 bytes in one buffer
+        raw = io.BytesIO()
+        output = io.TextIOWrapper(raw, encoding='utf-8', newline='', write_through=True)
+        writer = csv.writer(output)
+        
+        # Header and basic info: the labels are fixed, so only the values may need quoting
+        output.write(
+            "Website Analysis Report\r\n"
+            "\r\n"
+            "Basic Information\r\n"
+            f"URL,{_csv_escape(analysis_data.get('url', 'Unknown'))}\r\n"
+            f"Analysis Date,{_csv_escape(analysis_data.get('timestamp', ''))}\r\n"
+            f"Overall Score,{_PERCENT_FMT(analysis_data.get('crawlability_score', 0))}\r\n"
+            f"Confidence,{_PERCENT_FMT(analysis_data.get('confidence', 0) * 100)}\r\n"
+            f"Label,{_csv_escape(analysis_data.get('label', 'Unknown'))}\r\n"
+            "\r\n"
+        )
+        
+        # Recommendations
+        recommendations = analysis_data.get('recommendations', [])
+        if recommendations:
+            writer.writerow(['Recommendations'])
+            writer.writerow(['Priority', 'Title', 'Message'])
+            
+            writer.writerows(
+                (rec.get('priority', 'Medium'), rec.get('title', 'Unknown'), rec.get('message', 'No description'))
+                for rec in recommendations
+            )
+            writer.writerow([])
+        
+        # Technical features
+        features = analysis_data.get('features', {})
+        if features:
+            writer.writerow(['Technical Details'])
+            writer.writerow(['Metric', 'Value'])
+            
+            writer.writerows(_featurize(features))
+        
+        output.flush()
+        csv_content = raw.getvalue()
+        output.close()
+        
+        return csv_content
+    
+    async def generate_json_report(self, analysis_data: Dict[str, Any], pretty: bool = False) -> bytes:
         """
         Generate JSON report from analysis data
+        
+        Returned as UTF-8 bytes, ready to be sent as a response body. Output
+        is compact unless pretty is set, which indents it by two spaces.
         """
         try:
-            logger.info("📋 Generating JSON report")
+            logger.info("📋 Generating JSON report for %s", analysis_data.get('url', 'Unknown'))
             
             # Add metadata
             report_data = {
-                "report_metadata": {
-                    "generated_at": datetime.now().isoformat(),
-                    "format_version": "1.0",
-                    "generator": "Neurom AI Website Analyzer"
-                },
+                "report_metadata": {"generated_at": datetime.now().isoformat(), **_REPORT_META_TEMPLATE},
                 "analysis_data": analysis_data
             }
             
-            json_content = json.dumps(report_data, indent=2, ensure_ascii=False)
+            builder = functools.partial(self._build_json_sync, pretty=pretty)
+            json_content = await self._build_report(builder, report_data, analysis_data)
             
             logger.info("✅ JSON report generated successfully")
             return json_content
@@ -228,3 +363,28 @@ class ExportManager:
         except Exception as e:
             logger.error(f"❌ JSON generation failed: {str(e)}")
             raise
+    
+    def _build_json_sync(self, report_data: Dict[str, Any], pretty: bool = False) -> bytes:
+        """Serialize the JSON report (blocking)"""
+        json_content = None
+        if ORJSON_AVAILABLE:
+            option = orjson.OPT_NON_STR_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            try:
+                json_content = orjson.dumps(report_data, default=_json_default, option=option)
+            except TypeError as e:
+                # e.g. integers beyond 64 bits; the stdlib encoder copes with those
+                logger.warning("⚠️ orjson could not serialize report, falling back to json: %s", e)
+        
+        if json_content is None:
+            json_content = json.dumps(
+                report_data,
+                indent=2 if pretty else None,
+                separators=(',', ': ') if pretty else (',', ':'),
+                sort_keys=False,
+                ensure_ascii=False,
+                default=_json_default
+            ).encode('utf-8')
+        
+        return json_content
@@ -2,23 +2,190 @@
 Feature extraction from HTML content and web pages
 """
 
+import asyncio
+import gzip
 import re
 import time
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
+from operator import attrgetter
+from dataclasses import dataclass, field, fields
 from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup, Comment
+import lxml.html
+from lxml import etree
 import json
 from models.schemas import CrawlabilityFeatures
 import math
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+def _parse_html(content) -> lxml.html.HtmlElement:
+    """Parse HTML into an lxml document tree"""
+    try:
+        return lxml.html.document_fromstring(content)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        return lxml.html.document_fromstring(content.encode('utf-8'))
+    except etree.ParserError:
+        # Whitespace-only document
+        return lxml.html.document_fromstring('<html></html>')
+
+def _link_rel(rel: str) -> etree.XPath:
+    """Compile a check for a <link> whose rel list contains the given value"""
+    return etree.XPath(f'boolean(//link[contains(concat(" ", normalize-space(@rel), " "), " {rel} ")])')
+
+def _column(dtype: str):
+    """Declare a FeatureBatch column holding values of the given NumPy dtype"""
+    return field(metadata={'dtype': dtype})
+
+@dataclass
+class FeatureBatch:
+    """
+    Column-oriented view of many CrawlabilityFeatures: one contiguous NumPy array per
+    numeric feature, with the boolean features bit-packed into a single flags column
+    """
+    
+    # Boolean features in bit order (bit i of each flags value), at most 16
+    FLAGS = (
+        'https_enabled', 'title_tag_present', 'meta_description_present', 'open_graph_present',
+        'compression_enabled', 'cache_headers_present', 'canonical_tag_present', 'mobile_friendly',
+        'structured_data_present'
+    )
+    
+    urls: List[str]
+    status_code: 'np.ndarray' = _column('int32')
+    html_size: 'np.ndarray' = _column('int64')
+    word_count: 'np.ndarray' = _column('int32')
+    page_load_time: 'np.ndarray' = _column('float64')
+    title_length: 'np.ndarray' = _column('int32')
+    meta_description_length: 'np.ndarray' = _column('int32')
+    h1_count: 'np.ndarray' = _column('int32')
+    h2_count: 'np.ndarray' = _column('int32')
+    h3_count: 'np.ndarray' = _column('int32')
+    internal_links_count: 'np.ndarray' = _column('int32')
+    external_links_count: 'np.ndarray' = _column('int32')
+    images_count: 'np.ndarray' = _column('int32')
+    images_with_alt_count: 'np.ndarray' = _column('int32')
+    lazy_loading_images: 'np.ndarray' = _column('int32')
+    external_scripts_count: 'np.ndarray' = _column('int32')
+    external_stylesheets_count: 'np.ndarray' = _column('int32')
+    inline_css_count: 'np.ndarray' = _column('int32')
+    inline_js_count: 'np.ndarray' = _column('int32')
+    open_graph_tags_count: 'np.ndarray' = _column('int32')
+    security_headers_count: 'np.ndarray' = _column('int32')
+    accessibility_score: 'np.ndarray' = _column('float32')
+    performance_score: 'np.ndarray' = _column('float32')
+    seo_score: 'np.ndarray' = _column('float32')
+    flags: 'np.ndarray' = _column('<u2')
+    
+    def __len__(self) -> int:
+        return len(self.urls)
+    
+    def flag(self, name: str) -> 'np.ndarray':
+        """Unpack one boolean feature from the flags column"""
+        return (self.flags >> self.FLAGS.index(name)) & 1 != 0
+    
+    @classmethod
+    def from_objects(cls, features_list: List[CrawlabilityFeatures]) -> 'FeatureBatch':
+        """Read the feature objects in one pass, then split out the columns and pack the flags"""
+        columns = [f for f in fields(cls) if 'dtype' in f.metadata and f.name != 'flags']
+        names = [f.name for f in columns] + list(cls.FLAGS)
+        row = attrgetter(*names)
+        values = np.array([row(features) for features in features_list], dtype=np.float64)
+        values = values.reshape(len(features_list), len(names))
+        
+        # astype copies each column out of the row-major matrix into its own contiguous array
+        arrays = {f.name: values[:, i].astype(f.metadata['dtype']) for i, f in enumerate(columns)}
+        packed = np.packbits(values[:, len(columns):] != 0, axis=1, bitorder='little')
+        arrays['flags'] = packed.view('<u2').reshape(len(features_list))
+        return cls(urls=[features.url for features in features_list], **arrays)
+
 class FeatureExtractor:
     """
     Extract features from HTML content for crawlability analysis
     """
     
+    # Tags whose occurrences are counted as-is by _collect_all
+    _COUNTED_TAGS = frozenset({
+        'style', 'form', 'iframe', 'audio', 'table', 'button',
+        'input', 'select', 'textarea', 'label'
+    })
+    
+    # Attribute patterns used by the raw-feature helpers, compiled once
+    _ICON_RE = re.compile(r'icon', re.I)
+    _SEARCH_RE = re.compile(r'search', re.I)
+    _BREADCRUMB_RE = re.compile(r'breadcrumb', re.I)
+    _PAG_RE = re.compile(r'pag', re.I)
+    _NEXT_PREV_RE = re.compile(r'next|previous|prev', re.I)
+    _PRINT_RE = re.compile(r'print', re.I)
+    _RSS_RE = re.compile(r'rss|atom', re.I)
+    _SITEMAP_RE = re.compile(r'sitemap', re.I)
+    _ALAPP_RE = re.compile(r'al:|app:', re.I)
+    _LONG_NUM_RE = re.compile(r'\d{4,}')
+    _WORD_RE = re.compile(r'\b\w+\b')
+    _RESPONSIVE_RE = re.compile(r'@media|max-width|min-width|screen and|mobile|responsive', re.I)
+    
+    # The HTML spec requires the charset declaration within the first 1024 bytes
+    _CHARSET_RE = re.compile(rb'<meta[^>]+charset', re.I)
+    _CHARSET_SCAN_BYTES = 2048
+    
+    # Text nodes outside script/style count as visible text (comments are not text nodes)
+    _XP_VISIBLE_TEXT = etree.XPath('//text()[not(parent::script or parent::style)]', smart_strings=False)
+    
+    # Presence checks used by the raw-feature helpers, compiled once
+    _XP_STRUCTURED_DATA = etree.XPath('boolean(//script[@type="application/ld+json"] | //*[@itemscope] | //*[@typeof])')
+    _XP_SEARCH_FORM = etree.XPath('boolean(//form[@role="search"] | //input[@type="search"])')
+    _XP_NAMED_FIELDS = etree.XPath('//input[@name] | //form[@name]')
+    _XP_CLASSED = etree.XPath('//*[@class]')
+    _XP_WITH_ID = etree.XPath('//*[@id]')
+    _XP_LABELED_NAV = etree.XPath('//nav[@aria-label]')
+    _XP_LINK_REL_ATTR = etree.XPath('//link/@rel', smart_strings=False)
+    _XP_META_PROPERTY = etree.XPath('//meta/@property', smart_strings=False)
+    _XP_ANCHORS = etree.XPath('//a')
+    _XP_HREFLANG = etree.XPath('boolean(//link[@hreflang])')
+    _XP_LINK_NEXT = _link_rel('next')
+    _XP_LINK_PREV = _link_rel('prev')
+    _XP_LINK_AMP = _link_rel('amphtml')
+    _XP_PERFORMANCE_HINTS = {
+        'preload': _link_rel('preload'),
+        'prefetch': _link_rel('prefetch'),
+        'preconnect': _link_rel('preconnect'),
+        'dns_prefetch': _link_rel('dns-prefetch'),
+        'async_scripts': etree.XPath('boolean(//script[@async])'),
+        'defer_scripts': etree.XPath('boolean(//script[@defer])')
+    }
+    _XP_ACCESSIBILITY = {
+        'skip_links': etree.XPath('boolean(//a[@href="#main" or @href="#content"])'),
+        'aria_labels': etree.XPath('boolean(//*[@aria-label])'),
+        'aria_describedby': etree.XPath('boolean(//*[@aria-describedby])'),
+        'role_attributes': etree.XPath('boolean(//*[@role])'),
+        'alt_text_images': etree.XPath('boolean(//img[@alt])'),
+        'form_labels': etree.XPath('boolean(//label)'),
+        'heading_structure': etree.XPath('boolean(//h1 | //h2 | //h3 | //h4 | //h5 | //h6)')
+    }
+    
+    # Anchor href classifiers, matched once per link during the tree walk
+    _SOCIAL_DOMAINS_RE = re.compile(
+        r'(?:facebook|twitter|instagram|linkedin|youtube|pinterest|tiktok|snapchat)\.com', re.I
+    )
+    # Placeholder hrefs only: a bare '#', javascript: URLs, void(0) and 'undefined'
+    _BROKEN_LINK_RE = re.compile(r'^(?:#$|javascript:|.*void\(0\)|undefined$)', re.I)
+    
+    # Larger pages are compressed from a leading sample of this many bytes
+    _COMPRESSION_SAMPLE_SIZE = 65536
+    
+    # Response headers that make a page cacheable
+    _CACHE_HEADERS = frozenset(['cache-control', 'expires', 'etag', 'last-modified'])
+    
+    # Points per performance indicator column, matching _calculate_performance_score
+    _PERFORMANCE_WEIGHTS = (3.0, 2.0, 1.0, 2.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.5, 1.0)
+    
     def __init__(self):
         self.structured_data_types = [
             'application/ld+json',
@@ -27,7 +194,7 @@ class FeatureExtractor:
             'application/rdf+xml'
         ]
         
-        self.security_headers = [
+        self.security_headers = frozenset([
             'strict-transport-security',
             'content-security-policy',
             'x-frame-options',
@@ -35,7 +202,7 @@ class FeatureExtractor:
             'x-xss-protection',
             'referrer-policy',
             'permissions-policy'
-        ]
+        ])
         
         self.seo_keywords = [
             'title', 'description', 'keywords', 'author', 'robots',
@@ -59,131 +226,143 @@ class FeatureExtractor:
                 return self._create_empty_features()
             
             url = crawl_result['url']
-            content = crawl_result.get('html', '')
+            parsed_url = urlparse(url)
+            base_domain = parsed_url.netloc.lower()
+            content = crawl_result.get('html') or ''
+            # Unless asked to keep the HTML, the crawler hands over its parsed lxml tree
+            # and a leading sample of the body for the byte-level checks
+            tree = crawl_result.get('tree')
             headers = crawl_result.get('headers', {})
             status_code = crawl_result.get('status_code', 0)
-            
-            # Parse HTML
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # Extract all features
-            features = CrawlabilityFeatures(
-                url=url,
-                status_code=status_code,
-                https_enabled=url.startswith('https://'),
-                ssl_certificate_valid=not crawl_result.get('ssl_error', False),
-                html_size=len(content.encode('utf-8')),
-                word_count=self._count_words(soup),
-                page_load_time=crawl_result.get('crawl_time', 0.0)
+            headers_lower = {k.lower(): v for k, v in headers.items()}
+            
+            # URL- and header-level features need no parsing
+            features = self._create_response_features(url, parsed_url, status_code, headers_lower, crawl_result)
+            
+            # Don't parse empty bodies or non-HTML responses
+            content_type = headers_lower.get('content-type', '').lower()
+            if (not content and tree is None) or (content_type and 'html' not in content_type):
+                logger.info(f"⏭️ Skipping HTML analysis for {url} (content-type: {content_type or 'unknown'})")
+                features.performance_score = self._calculate_performance_score(features, crawl_result)
+                features.seo_score = self._calculate_seo_score(features, None)
+                return features
+            
+            if content:
+                # Encode once; reused for the page size and the compression estimate
+                content_bytes = content.encode('utf-8')
+                html_size = len(content_bytes)
+            else:
+                content_bytes = crawl_result.get('html_sample') or b''
+                content = content_bytes.decode('utf-8', errors='replace')
+                html_size = crawl_result.get('html_size', len(content_bytes))
+            
+            # CPU-bound work runs in worker threads so the event loop keeps serving other crawls;
+            # gzip releases the GIL, so the compression estimate overlaps with parsing
+            compression_task = asyncio.create_task(
+                asyncio.to_thread(self._calculate_text_compression_ratio, content_bytes)
             )
             
-            # Security features
-            features.security_headers_count = self._count_security_headers(headers)
+            # Parse HTML, unless the crawler already did
+            document = tree if tree is not None else await asyncio.to_thread(_parse_html, content)
+            
+            # Visible text, shared by the word count and content ratio
+            visible_text = await asyncio.to_thread(self._get_visible_text, document)
+            
+            # Content metrics
+            features.html_size = html_size
+            features.word_count = self._count_words(visible_text)
+            
+            # Tag-level counts, collected in a single walk over the tree
+            counts = await asyncio.to_thread(self._collect_all, document, url, base_domain)
             
             # Meta tags
-            features.title_length = self._get_title_length(soup)
+            features.title_length = counts['title_length']
             features.title_tag_present = features.title_length > 0
-            features.meta_description_length = self._get_meta_description_length(soup)
+            features.meta_description_length = counts['meta_description_length']
             features.meta_description_present = features.meta_description_length > 0
             
             # Heading structure
-            features.h1_count = len(soup.find_all('h1'))
-            features.h2_count = len(soup.find_all('h2'))
-            features.h3_count = len(soup.find_all('h3'))
-            
-            # Get H1 text
-            h1_tag = soup.find('h1')
-            features.h1_text = h1_tag.get_text().strip() if h1_tag else ""
+            features.h1_count = counts['h1']
+            features.h2_count = counts['h2']
+            features.h3_count = counts['h3']
+            features.h1_text = counts['h1_text']
             
             # Links analysis
-            internal_links, external_links = self._analyze_links(soup, url)
-            features.internal_links_count = internal_links
-            features.external_links_count = external_links
+            features.internal_links_count = counts['a_internal']
+            features.external_links_count = counts['a_external']
             
             # Images analysis
-            images_data = self._analyze_images(soup)
-            features.images_count = images_data['total']
-            features.images_with_alt_count = images_data['with_alt']
-            features.lazy_loading_images = images_data['lazy_loading']
+            features.images_count = counts['img_total']
+            features.images_with_alt_count = counts['img_alt']
+            features.lazy_loading_images = counts['img_lazy']
             
             # Technical SEO
-            features.canonical_tag_present = self._has_canonical_tag(soup)
-            features.meta_robots_noindex = self._has_noindex_meta(soup)
-            features.structured_data_present = self._has_structured_data(soup)
-            features.open_graph_tags_count = self._count_open_graph_tags(soup)
+            features.canonical_tag_present = counts['canonical']
+            features.meta_robots_noindex = counts['noindex']
+            features.structured_data_present = self._has_structured_data(document)
+            features.open_graph_tags_count = counts['og']
             features.open_graph_present = features.open_graph_tags_count > 0
-            features.twitter_cards_present = self._has_twitter_card(soup)
+            features.twitter_cards_present = counts['twitter_card']
             
             # Mobile and viewport
-            features.viewport_configured = self._has_viewport_meta(soup)
-            features.mobile_friendly = self._is_mobile_friendly(soup, content)
+            features.viewport_configured = counts['viewport']
+            features.mobile_friendly = self._is_mobile_friendly(features.viewport_configured, content)
             
             # External resources
-            features.external_scripts_count = self._count_external_scripts(soup, url)
-            features.external_stylesheets_count = self._count_external_stylesheets(soup, url)
+            features.external_scripts_count = counts['script_external']
+            features.external_stylesheets_count = counts['stylesheet_external']
             
             # Additional features
-            features.favicon_present = self._has_favicon(soup)
-            features.lang_attribute_present = self._has_lang_attribute(soup)
-            features.charset_declared = self._has_charset_declaration(soup, content)
-            features.inline_css_count = len(soup.find_all('style'))
-            features.inline_js_count = len(soup.find_all('script', src=False))
-            
-            # Performance features
-            features.compression_enabled = 'gzip' in headers.get('content-encoding', '').lower() or \
-                                         'br' in headers.get('content-encoding', '').lower()
-            
-            cache_headers = ['cache-control', 'expires', 'etag', 'last-modified']
-            features.cache_headers_present = any(h in [k.lower() for k in headers.keys()] for h in cache_headers)
+            features.favicon_present = self._has_favicon(document)
+            features.lang_attribute_present = counts['lang']
+            features.charset_declared = self._has_charset_declaration(content_bytes)
+            features.inline_css_count = counts['style']
+            features.inline_js_count = counts['script_inline']
             
             # Calculate scores
-            features.accessibility_score = self._calculate_accessibility_score(soup)
+            features.accessibility_score = self._calculate_accessibility_score(counts)
             features.performance_score = self._calculate_performance_score(features, crawl_result)
-            features.seo_score = self._calculate_seo_score(features, soup)
+            features.seo_score = self._calculate_seo_score(features, document)
+            
+            text_compression_ratio = await compression_task
             
             # Additional raw features for extensibility
-            features.raw_features = {
-                'has_favicon': self._has_favicon(soup),
-                'has_lang_attribute': self._has_lang_attribute(soup),
-                'has_charset_declaration': self._has_charset_declaration(soup, content),
-                'inline_styles_count': len(soup.find_all('style')),
-                'inline_scripts_count': len(soup.find_all('script', src=False)),
-                'comment_count': len(soup.find_all(string=lambda text: isinstance(text, Comment))),
-                'form_count': len(soup.find_all('form')),
-                'iframe_count': len(soup.find_all('iframe')),
-                'video_count': len(soup.find_all(['video', 'embed', 'object'])),
-                'audio_count': len(soup.find_all('audio')),
-                'table_count': len(soup.find_all('table')),
-                'list_count': len(soup.find_all(['ul', 'ol'])),
-                'button_count': len(soup.find_all(['button', 'input[type="button"]', 'input[type="submit"]'])),
-                'input_count': len(soup.find_all('input')),
-                'select_count': len(soup.find_all('select')),
-                'textarea_count': len(soup.find_all('textarea')),
-                'has_search_functionality': self._has_search_functionality(soup),
-                'has_breadcrumbs': self._has_breadcrumbs(soup),
-                'has_pagination': self._has_pagination(soup),
-                'has_social_media_links': self._has_social_media_links(soup),
-                'content_to_html_ratio': self._calculate_content_ratio(soup, content),
-                'text_compression_ratio': self._calculate_text_compression_ratio(content),
-                'duplicate_title_tags': len(soup.find_all('title')) > 1,
-                'duplicate_h1_tags': len(soup.find_all('h1')) > 1,
-                'missing_alt_images': images_data['total'] - images_data['with_alt'],
-                'broken_links_indicators': self._detect_broken_link_indicators(soup),
-                'has_print_stylesheet': self._has_print_stylesheet(soup),
-                'has_rss_feed': self._has_rss_feed(soup),
-                'has_sitemap_reference': self._has_sitemap_reference(soup),
-                'page_depth_estimate': self._estimate_page_depth(url),
-                'url_length': len(url),
-                'url_parameters_count': len(urlparse(url).query.split('&')) if urlparse(url).query else 0,
-                'has_www_prefix': url.startswith('https://www.') or url.startswith('http://www.'),
-                'domain_extension': urlparse(url).netloc.split('.')[-1] if '.' in urlparse(url).netloc else '',
-                'has_hreflang': self._has_hreflang_tags(soup),
-                'has_amp_version': self._has_amp_version(soup),
-                'has_mobile_app_links': self._has_mobile_app_links(soup),
-                'performance_hints': self._detect_performance_hints(soup),
-                'accessibility_features': self._detect_accessibility_features(soup),
-                'seo_friendly_urls': self._has_seo_friendly_urls(soup, url)
-            }
+            features.raw_features.update({
+                'has_favicon': features.favicon_present,
+                'has_lang_attribute': features.lang_attribute_present,
+                'has_charset_declaration': features.charset_declared,
+                'inline_styles_count': features.inline_css_count,
+                'inline_scripts_count': features.inline_js_count,
+                'comment_count': counts['comment'],
+                'form_count': counts['form'],
+                'iframe_count': counts['iframe'],
+                'video_count': counts['video'],
+                'audio_count': counts['audio'],
+                'table_count': counts['table'],
+                'list_count': counts['list'],
+                'button_count': counts['button'],
+                'input_count': counts['input'],
+                'select_count': counts['select'],
+                'textarea_count': counts['textarea'],
+                'has_search_functionality': self._has_search_functionality(document),
+                'has_breadcrumbs': self._has_breadcrumbs(document),
+                'has_pagination': self._has_pagination(document),
+                'has_social_media_links': counts['a_social'],
+                'content_to_html_ratio': self._calculate_content_ratio(visible_text, html_size if tree is not None else len(content)),
+                'text_compression_ratio': text_compression_ratio,
+                'duplicate_title_tags': counts['title'] > 1,
+                'duplicate_h1_tags': features.h1_count > 1,
+                'missing_alt_images': counts['img_total'] - counts['img_alt'],
+                'broken_links_indicators': counts['a_broken'],
+                'has_print_stylesheet': counts['print_stylesheet'],
+                'has_rss_feed': counts['rss_feed'],
+                'has_sitemap_reference': counts['a_sitemap'],
+                'has_hreflang': self._has_hreflang_tags(document),
+                'has_amp_version': self._has_amp_version(document),
+                'has_mobile_app_links': self._has_mobile_app_links(document),
+                'performance_hints': self._detect_performance_hints(document),
+                'accessibility_features': self._detect_accessibility_features(document)
+            })
             
             extraction_time = time.time() - start_time
             logger.info(f"✅ Feature extraction completed in {extraction_time:.2f}s")
@@ -206,619 +385,557 @@ class FeatureExtractor:
             page_load_time=0.0
         )
     
-    def _count_security_headers(self, headers: Dict[str, str]) -> int:
-        """Count security headers present"""
-        count = 0
-        headers_lower = {k.lower(): v for k, v in headers.items()}
+    def _create_response_features(self, url: str, parsed_url, status_code: int,
+                                  headers_lower: Dict[str, str], crawl_result: Dict[str, Any]) -> CrawlabilityFeatures:
+        """Create features that only depend on the URL and response headers"""
+        features = CrawlabilityFeatures(
+            url=url,
+            status_code=status_code,
+            https_enabled=url.startswith('https://'),
+            ssl_certificate_valid=not crawl_result.get('ssl_error', False),
+            html_size=crawl_result.get('html_size', 0),
+            word_count=0,
+            page_load_time=crawl_result.get('crawl_time', 0.0)
+        )
+        
+        # Security features
+        features.security_headers_count = self._count_security_headers(headers_lower)
+        
+        # Performance features
+        content_encoding = headers_lower.get('content-encoding', '').lower()
+        features.compression_enabled = 'gzip' in content_encoding or 'br' in content_encoding
         
-        for header in self.security_headers:
-            if header in headers_lower:
-                count += 1
+        features.cache_headers_present = not self._CACHE_HEADERS.isdisjoint(headers_lower)
         
-        return count
+        features.raw_features = {
+            'page_depth_estimate': self._estimate_page_depth(parsed_url.path),
+            'url_length': len(url),
+            'url_parameters_count': len(parsed_url.query.split('&')) if parsed_url.query else 0,
+            'has_www_prefix': url.startswith('https://www.') or url.startswith('http://www.'),
+            'domain_extension': parsed_url.netloc.split('.')[-1] if '.' in parsed_url.netloc else '',
+            'seo_friendly_urls': self._has_seo_friendly_urls(parsed_url.path)
+        }
+        
+        return features
     
-    def _count_words(self, soup: BeautifulSoup) -> int:
-        """Count words in visible text content"""
-        try:
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Get text and count words
-            text = soup.get_text()
-            words = re.findall(r'\b\w+\b', text)
-            return len(words)
-        except:
-            return 0
+    def _count_security_headers(self, headers_lower: Dict[str, str]) -> int:
+        """Count security headers present (header names must already be lowercased)"""
+        return sum(1 for header in self.security_headers if header in headers_lower)
     
-    def _get_title_length(self, soup: BeautifulSoup) -> int:
-        """Get title tag length"""
+    def _get_visible_text(self, document: lxml.html.HtmlElement) -> str:
+        """Get the document text without script and style contents"""
         try:
-            title_tag = soup.find('title')
-            return len(title_tag.get_text().strip()) if title_tag else 0
+            # Select the text around script/style instead of dropping them, so a shared tree stays intact
+            return ''.join(self._XP_VISIBLE_TEXT(document))
         except:
-            return 0
+            return ""
     
-    def _get_meta_description_length(self, soup: BeautifulSoup) -> int:
-        """Get meta description length"""
+    def _count_words(self, text: str) -> int:
+        """Count words in visible text content"""
         try:
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc and meta_desc.get('content'):
-                return len(meta_desc['content'].strip())
-            return 0
+            return sum(1 for _ in self._WORD_RE.finditer(text))
         except:
             return 0
     
-    def _analyze_links(self, soup: BeautifulSoup, base_url: str) -> Tuple[int, int]:
-        """Analyze internal and external links"""
-        try:
-            base_domain = urlparse(base_url).netloc.lower()
-            internal_count = 0
-            external_count = 0
-            
-            for link in soup.find_all('a', href=True):
-                href = link['href'].strip()
-                if not href or href.startswith('#') or href.startswith('mailto:') or href.startswith('tel:'):
+    def _collect_all(self, document: lxml.html.HtmlElement, base_url: str, base_domain: str) -> Dict[str, Any]:
+        """Collect tag-level counts in a single walk over the parsed tree"""
+        counts = {
+            'h1': 0, 'h2': 0, 'h3': 0, 'h1_text': '',
+            'title': 0, 'title_length': 0,
+            'meta_description_length': 0, 'noindex': False, 'viewport': False,
+            'og': 0, 'twitter_card': False, 'canonical': False, 'lang': False,
+            'print_stylesheet': False, 'rss_feed': False,
+            'img_total': 0, 'img_alt': 0, 'img_alt_text': 0, 'img_lazy': 0,
+            'a_internal': 0, 'a_external': 0, 'a_fragment': 0, 'a_broken': 0, 'a_social': False,
+            'a_sitemap': False,
+            'script_inline': 0, 'script_external': 0, 'stylesheet_external': 0, 'style': 0,
+            'form': 0, 'iframe': 0, 'video': 0, 'audio': 0, 'table': 0, 'list': 0,
+            'button': 0, 'input': 0, 'select': 0, 'textarea': 0, 'label': 0, 'aria': 0,
+            'comment': 0
+        }
+        try:
+            seen = set()
+            
+            # Comments before or after the <html> element sit outside the root
+            for sibling in (*document.itersiblings(preceding=True), *document.itersiblings()):
+                if sibling.tag is etree.Comment:
+                    counts['comment'] += 1
+            
+            for el in document.iter():
+                name = el.tag
+                if not isinstance(name, str):
+                    if name is etree.Comment:
+                        counts['comment'] += 1
                     continue
                 
-                # Resolve relative URLs
-                full_url = urljoin(base_url, href)
-                link_domain = urlparse(full_url).netloc.lower()
+                if el.get('aria-label') is not None or el.get('aria-labelledby') is not None:
+                    counts['aria'] += 1
                 
-                if link_domain == base_domain:
-                    internal_count += 1
-                elif link_domain:  # External link with valid domain
-                    external_count += 1
-            
-            return internal_count, external_count
-        except:
-            return 0, 0
-    
-    def _analyze_images(self, soup: BeautifulSoup) -> Dict[str, int]:
-        """Analyze images for alt text and lazy loading"""
-        try:
-            images = soup.find_all('img')
-            total = len(images)
-            with_alt = 0
-            lazy_loading = 0
-            
-            for img in images:
-                # Check for alt text
-                if img.get('alt') is not None:
-                    with_alt += 1
-                
-                # Check for lazy loading
-                if (img.get('loading') == 'lazy' or 
-                    'lazy' in img.get('class', []) or
-                    img.get('data-src')):
-                    lazy_loading += 1
-            
-            return {
-                'total': total,
-                'with_alt': with_alt,
-                'lazy_loading': lazy_loading
-            }
-        except:
-            return {'total': 0, 'with_alt': 0, 'lazy_loading': 0}
-    
-    def _has_canonical_tag(self, soup: BeautifulSoup) -> bool:
-        """Check for canonical link tag"""
-        try:
-            canonical = soup.find('link', rel='canonical')
-            return canonical is not None and canonical.get('href')
-        except:
-            return False
-    
-    def _has_noindex_meta(self, soup: BeautifulSoup) -> bool:
-        """Check for noindex meta robots tag"""
-        try:
-            robots_meta = soup.find('meta', attrs={'name': 'robots'})
-            if robots_meta and robots_meta.get('content'):
-                content = robots_meta['content'].lower()
-                return 'noindex' in content
-            return False
-        except:
-            return False
-    
-    def _has_structured_data(self, soup: BeautifulSoup) -> bool:
-        """Check for structured data (JSON-LD, microdata, etc.)"""
-        try:
-            # JSON-LD
-            json_ld = soup.find('script', type='application/ld+json')
-            if json_ld:
-                return True
-            
-            # Microdata
-            microdata = soup.find(attrs={'itemscope': True})
-            if microdata:
-                return True
-            
-            # RDFa
-            rdfa = soup.find(attrs={'typeof': True})
-            if rdfa:
-                return True
-            
-            return False
-        except:
-            return False
+                if name == 'a':
+                    href = el.get('href')
+                    if href is None:
+                        continue
+                    if href.startswith('#'):
+                        counts['a_fragment'] += 1
+                    if self._BROKEN_LINK_RE.search(href):
+                        counts['a_broken'] += 1
+                    if not counts['a_social'] and self._SOCIAL_DOMAINS_RE.search(href):
+                        counts['a_social'] = True
+                    if not counts['a_sitemap'] and self._SITEMAP_RE.search(href):
+                        counts['a_sitemap'] = True
+                    href = href.strip()
+                    if not href or href.startswith('#') or href.startswith('mailto:') or href.startswith('tel:'):
+                        continue
+                    
+                    # Resolve relative URLs; absolute ones already carry their domain
+                    if not href.startswith(('http://', 'https://', '//')):
+                        href = urljoin(base_url, href)
+                    link_domain = urlparse(href).netloc.lower()
+                    if link_domain == base_domain:
+                        counts['a_internal'] += 1
+                    elif link_domain:  # External link with valid domain
+                        counts['a_external'] += 1
+                elif name == 'img':
+                    counts['img_total'] += 1
+                    alt = el.get('alt')
+                    if alt is not None:
+                        counts['img_alt'] += 1
+                        if alt:
+                            counts['img_alt_text'] += 1
+                    if el.get('loading') == 'lazy' or 'lazy' in el.get('class', '').split() or el.get('data-src'):
+                        counts['img_lazy'] += 1
+                elif name == 'meta':
+                    meta_name = el.get('name')
+                    if meta_name == 'description' and 'description' not in seen:
+                        seen.add('description')
+                        if el.get('content'):
+                            counts['meta_description_length'] = len(el.get('content').strip())
+                    elif meta_name == 'robots' and 'robots' not in seen:
+                        seen.add('robots')
+                        if el.get('content'):
+                            counts['noindex'] = 'noindex' in el.get('content').lower()
+                    elif meta_name == 'viewport' and 'viewport' not in seen:
+                        seen.add('viewport')
+                        counts['viewport'] = bool(el.get('content'))
+                    elif meta_name == 'twitter:card':
+                        counts['twitter_card'] = True
+                    if el.get('property', '').startswith('og:'):
+                        counts['og'] += 1
+                elif name == 'link':
+                    rel = el.get('rel', '').split()
+                    if 'canonical' in rel and 'canonical' not in seen:
+                        seen.add('canonical')
+                        counts['canonical'] = bool(el.get('href'))
+                    if 'stylesheet' in rel and el.get('href') is not None:
+                        counts['stylesheet_external'] += self._is_external_resource(el.get('href'), base_domain)
+                    if not counts['print_stylesheet'] and self._PRINT_RE.search(el.get('media', '')):
+                        counts['print_stylesheet'] = True
+                    if not counts['rss_feed'] and self._RSS_RE.search(el.get('type', '')):
+                        counts['rss_feed'] = True
+                elif name == 'script':
+                    src = el.get('src')
+                    if src is None:
+                        counts['script_inline'] += 1
+                    else:
+                        counts['script_external'] += self._is_external_resource(src, base_domain)
+                elif name in ('h1', 'h2', 'h3'):
+                    if name == 'h1' and not counts['h1']:
+                        counts['h1_text'] = el.text_content().strip()
+                    counts[name] += 1
+                elif name == 'title':
+                    if not counts['title']:
+                        counts['title_length'] = len(el.text_content().strip())
+                    counts['title'] += 1
+                elif name == 'html':
+                    if 'html' not in seen:
+                        seen.add('html')
+                        counts['lang'] = bool(el.get('lang'))
+                elif name in ('video', 'embed', 'object'):
+                    counts['video'] += 1
+                elif name in ('ul', 'ol'):
+                    counts['list'] += 1
+                elif name in self._COUNTED_TAGS:
+                    counts[name] += 1
+            
+            return counts
+        except Exception:
+            return counts
     
-    def _count_open_graph_tags(self, soup: BeautifulSoup) -> int:
-        """Count Open Graph meta tags"""
-        try:
-            og_tags = soup.find_all('meta', attrs={'property': re.compile(r'^og:')})
-            return len(og_tags)
-        except:
-            return 0
+    def _is_external_resource(self, src: str, base_domain: str) -> int:
+        """Return 1 if an absolute resource URL points at another domain"""
+        src = src.strip()
+        if src.startswith('//') or src.startswith('http'):
+            domain = urlparse(src).netloc.lower()
+            if domain and domain != base_domain:
+                return 1
+        return 0
     
-    def _has_twitter_card(self, soup: BeautifulSoup) -> bool:
-        """Check for Twitter Card meta tags"""
+    def _has_structured_data(self, document: lxml.html.HtmlElement) -> bool:
+        """Check for structured data (JSON-LD, microdata, RDFa)"""
         try:
-            twitter_card = soup.find('meta', attrs={'name': 'twitter:card'})
-            return twitter_card is not None
+            return self._XP_STRUCTURED_DATA(document)
         except:
             return False
     
-    def _has_viewport_meta(self, soup: BeautifulSoup) -> bool:
-        """Check for viewport meta tag"""
-        try:
-            viewport = soup.find('meta', attrs={'name': 'viewport'})
-            return viewport is not None and viewport.get('content')
-        except:
-            return False
-    
-    def _is_mobile_friendly(self, soup: BeautifulSoup, content: str) -> bool:
+    def _is_mobile_friendly(self, viewport_configured: bool, content: str) -> bool:
         """Basic mobile-friendliness check"""
         try:
             # Check for viewport meta tag
-            if not self._has_viewport_meta(soup):
+            if not viewport_configured:
                 return False
             
-            # Check for responsive CSS indicators
-            responsive_indicators = [
-                '@media',
-                'max-width',
-                'min-width',
-                'screen and',
-                'mobile',
-                'responsive'
-            ]
-            
-            content_lower = content.lower()
-            for indicator in responsive_indicators:
-                if indicator in content_lower:
-                    return True
-            
-            return False
+            # Check for responsive CSS indicators in one case-insensitive scan
+            return bool(self._RESPONSIVE_RE.search(content))
         except:
             return False
     
-    def _count_external_scripts(self, soup: BeautifulSoup, base_url: str) -> int:
-        """Count external JavaScript files"""
-        try:
-            base_domain = urlparse(base_url).netloc.lower()
-            external_count = 0
-            
-            for script in soup.find_all('script', src=True):
-                src = script['src'].strip()
-                if src.startswith('//') or src.startswith('http'):
-                    script_domain = urlparse(src).netloc.lower()
-                    if script_domain and script_domain != base_domain:
-                        external_count += 1
-            
-            return external_count
-        except:
-            return 0
-    
-    def _count_external_stylesheets(self, soup: BeautifulSoup, base_url: str) -> int:
-        """Count external CSS files"""
-        try:
-            base_domain = urlparse(base_url).netloc.lower()
-            external_count = 0
-            
-            for link in soup.find_all('link', rel='stylesheet', href=True):
-                href = link['href'].strip()
-                if href.startswith('//') or href.startswith('http'):
-                    css_domain = urlparse(href).netloc.lower()
-                    if css_domain and css_domain != base_domain:
-                        external_count += 1
-            
-            return external_count
-        except:
-            return 0
-    
-    # Additional helper methods for raw features
-    def _has_favicon(self, soup: BeautifulSoup) -> bool:
+    def _has_favicon(self, document: lxml.html.HtmlElement) -> bool:
         """Check for favicon"""
         try:
-            favicon = soup.find('link', rel=re.compile(r'icon', re.I))
-            return favicon is not None
+            return any(self._ICON_RE.search(rel) for rel in self._XP_LINK_REL_ATTR(document))
         except:
             return False
     
-    def _has_lang_attribute(self, soup: BeautifulSoup) -> bool:
-        """Check for lang attribute on html tag"""
-        try:
-            html_tag = soup.find('html')
-            return html_tag is not None and html_tag.get('lang')
-        except:
-            return False
-    
-    def _has_charset_declaration(self, soup: BeautifulSoup, content: str) -> bool:
+    def _has_charset_declaration(self, content_bytes: bytes) -> bool:
         """Check for charset declaration"""
         try:
-            # Check meta charset
-            charset_meta = soup.find('meta', charset=True)
-            if charset_meta:
-                return True
-            
-            # Check http-equiv content-type
-            content_type = soup.find('meta', attrs={'http-equiv': 'Content-Type'})
-            if content_type and content_type.get('content'):
-                return 'charset' in content_type['content'].lower()
-            
-            return False
+            # <meta charset> or an http-equiv Content-Type with a charset, within the document prefix
+            return bool(self._CHARSET_RE.search(content_bytes[:self._CHARSET_SCAN_BYTES]))
         except:
             return False
     
-    def _has_search_functionality(self, soup: BeautifulSoup) -> bool:
+    def _has_search_functionality(self, document: lxml.html.HtmlElement) -> bool:
         """Check for search functionality"""
         try:
-            # Look for search forms
-            search_forms = soup.find_all('form', attrs={'role': 'search'})
-            if search_forms:
-                return True
-            
-            # Look for search inputs
-            search_inputs = soup.find_all('input', attrs={'type': 'search'})
-            if search_inputs:
+            # Look for search forms and inputs
+            if self._XP_SEARCH_FORM(document):
                 return True
             
             # Look for common search patterns
-            search_patterns = soup.find_all(['input', 'form'], attrs={'name': re.compile(r'search', re.I)})
-            return len(search_patterns) > 0
+            return any(self._SEARCH_RE.search(el.get('name')) for el in self._XP_NAMED_FIELDS(document))
         except:
             return False
     
-    def _has_breadcrumbs(self, soup: BeautifulSoup) -> bool:
+    def _has_breadcrumbs(self, document: lxml.html.HtmlElement) -> bool:
         """Check for breadcrumb navigation"""
         try:
-            # Look for breadcrumb patterns
-            breadcrumb_indicators = [
-                soup.find(attrs={'class': re.compile(r'breadcrumb', re.I)}),
-                soup.find(attrs={'id': re.compile(r'breadcrumb', re.I)}),
-                soup.find('nav', attrs={'aria-label': re.compile(r'breadcrumb', re.I)}),
-                soup.find('ol', attrs={'class': re.compile(r'breadcrumb', re.I)})
-            ]
-            
-            return any(indicator is not None for indicator in breadcrumb_indicators)
+            # Look for breadcrumb patterns, stopping at the first match
+            if any(self._BREADCRUMB_RE.search(el.get('class')) for el in self._XP_CLASSED(document)):
+                return True
+            if any(self._BREADCRUMB_RE.search(el.get('id')) for el in self._XP_WITH_ID(document)):
+                return True
+            return any(self._BREADCRUMB_RE.search(el.get('aria-label')) for el in self._XP_LABELED_NAV(document))
         except:
             return False
     
-    def _has_pagination(self, soup: BeautifulSoup) -> bool:
+    def _has_pagination(self, document: lxml.html.HtmlElement) -> bool:
         """Check for pagination"""
         try:
-            pagination_indicators = [
-                soup.find(attrs={'class': re.compile(r'pag', re.I)}),
-                soup.find('a', string=re.compile(r'next|previous|prev', re.I)),
-                soup.find('link', rel='next'),
-                soup.find('link', rel='prev')
-            ]
-            
-            return any(indicator is not None for indicator in pagination_indicators)
+            # Stop at the first pagination indicator found
+            if any(self._PAG_RE.search(el.get('class')) for el in self._XP_CLASSED(document)):
+                return True
+            if any(
+                (text := self._single_string(a)) and self._NEXT_PREV_RE.search(text)
+                for a in self._XP_ANCHORS(document)
+            ):
+                return True
+            return self._XP_LINK_NEXT(document) or self._XP_LINK_PREV(document)
         except:
             return False
     
-    def _has_social_media_links(self, soup: BeautifulSoup) -> bool:
-        """Check for social media links"""
-        try:
-            social_domains = [
-                'facebook.com', 'twitter.com', 'instagram.com', 'linkedin.com',
-                'youtube.com', 'pinterest.com', 'tiktok.com', 'snapchat.com'
-            ]
-            
-            for link in soup.find_all('a', href=True):
-                href = link['href'].lower()
-                if any(domain in href for domain in social_domains):
-                    return True
-            
-            return False
-        except:
-            return False
+    @staticmethod
+    def _single_string(el: lxml.html.HtmlElement) -> Optional[str]:
+        """Return the element's text if it is its only content, looking through lone child tags"""
+        while len(el) == 1 and not el.text and not el[0].tail and isinstance(el[0].tag, str):
+            el = el[0]
+        return el.text if len(el) == 0 else None
     
-    def _calculate_content_ratio(self, soup: BeautifulSoup, html_content: str) -> float:
+    def _calculate_content_ratio(self, visible_text: str, html_length: int) -> float:
         """Calculate text content to HTML ratio"""
         try:
-            # Remove script and style elements
-            soup_copy = BeautifulSoup(html_content, 'html.parser')
-            for script in soup_copy(["script", "style"]):
-                script.decompose()
-            
-            text_content = soup_copy.get_text()
-            text_length = len(text_content.strip())
-            html_length = len(html_content)
+            text_length = len(visible_text.strip())
             
             return text_length / html_length if html_length > 0 else 0.0
         except:
             return 0.0
     
-    def _calculate_text_compression_ratio(self, content: str) -> float:
+    def _calculate_text_compression_ratio(self, content_bytes: bytes) -> float:
         """Estimate text compression ratio"""
         try:
-            import gzip
-            original_size = len(content.encode('utf-8'))
-            compressed_size = len(gzip.compress(content.encode('utf-8')))
+            # A fast level on a representative sample is enough for a ratio estimate
+            sample = content_bytes[:self._COMPRESSION_SAMPLE_SIZE]
+            original_size = len(sample)
+            compressed_size = len(gzip.compress(sample, compresslevel=1))
             return compressed_size / original_size if original_size > 0 else 1.0
         except:
             return 1.0
     
-    def _detect_broken_link_indicators(self, soup: BeautifulSoup) -> int:
-        """Detect potential broken link indicators"""
-        try:
-            broken_indicators = 0
-            
-            for link in soup.find_all('a', href=True):
-                href = link['href'].lower()
-                # Common broken link patterns
-                if any(pattern in href for pattern in ['#', 'javascript:', 'void(0)', 'undefined']):
-                    broken_indicators += 1
-            
-            return broken_indicators
-        except:
-            return 0
-    
-    def _has_print_stylesheet(self, soup: BeautifulSoup) -> bool:
-        """Check for print stylesheet"""
-        try:
-            print_css = soup.find('link', attrs={'media': re.compile(r'print', re.I)})
-            return print_css is not None
-        except:
-            return False
-    
-    def _has_rss_feed(self, soup: BeautifulSoup) -> bool:
-        """Check for RSS feed link"""
-        try:
-            rss_link = soup.find('link', type=re.compile(r'rss|atom', re.I))
-            return rss_link is not None
-        except:
-            return False
-    
-    def _has_sitemap_reference(self, soup: BeautifulSoup) -> bool:
-        """Check for sitemap reference"""
-        try:
-            sitemap_link = soup.find('a', href=re.compile(r'sitemap', re.I))
-            return sitemap_link is not None
-        except:
-            return False
-    
-    def _estimate_page_depth(self, url: str) -> int:
+    def _estimate_page_depth(self, path: str) -> int:
         """Estimate page depth from URL structure"""
         try:
-            path = urlparse(url).path
             return len([p for p in path.split('/') if p])
         except:
             return 0
     
-    def _has_hreflang_tags(self, soup: BeautifulSoup) -> bool:
+    def _has_hreflang_tags(self, document: lxml.html.HtmlElement) -> bool:
         """Check for hreflang tags"""
         try:
-            hreflang = soup.find('link', hreflang=True)
-            return hreflang is not None
+            return self._XP_HREFLANG(document)
         except:
             return False
     
-    def _has_amp_version(self, soup: BeautifulSoup) -> bool:
+    def _has_amp_version(self, document: lxml.html.HtmlElement) -> bool:
         """Check for AMP version link"""
         try:
-            amp_link = soup.find('link', rel='amphtml')
-            return amp_link is not None
+            return self._XP_LINK_AMP(document)
         except:
             return False
     
-    def _has_mobile_app_links(self, soup: BeautifulSoup) -> bool:
+    def _has_mobile_app_links(self, document: lxml.html.HtmlElement) -> bool:
         """Check for mobile app links"""
         try:
-            app_links = soup.find_all('meta', attrs={'property': re.compile(r'al:|app:', re.I)})
-            return len(app_links) > 0
+            return any(self._ALAPP_RE.search(prop) for prop in self._XP_META_PROPERTY(document))
         except:
             return False
     
-    def _detect_performance_hints(self, soup: BeautifulSoup) -> Dict[str, bool]:
+    def _detect_performance_hints(self, document: lxml.html.HtmlElement) -> Dict[str, bool]:
         """Detect performance optimization hints"""
         try:
-            hints = {
-                'preload': bool(soup.find('link', rel='preload')),
-                'prefetch': bool(soup.find('link', rel='prefetch')),
-                'preconnect': bool(soup.find('link', rel='preconnect')),
-                'dns_prefetch': bool(soup.find('link', rel='dns-prefetch')),
-                'async_scripts': bool(soup.find('script', async_=True)),
-                'defer_scripts': bool(soup.find('script', defer=True))
-            }
-            return hints
+            return {name: check(document) for name, check in self._XP_PERFORMANCE_HINTS.items()}
         except:
             return {}
     
-    def _detect_accessibility_features(self, soup: BeautifulSoup) -> Dict[str, bool]:
+    def _detect_accessibility_features(self, document: lxml.html.HtmlElement) -> Dict[str, bool]:
         """Detect accessibility features"""
         try:
-            features = {
-                'skip_links': bool(soup.find('a', href='#main') or soup.find('a', href='#content')),
-                'aria_labels': bool(soup.find(attrs={'aria-label': True})),
-                'aria_describedby': bool(soup.find(attrs={'aria-describedby': True})),
-                'role_attributes': bool(soup.find(attrs={'role': True})),
-                'alt_text_images': len(soup.find_all('img', alt=True)) > 0,
-                'form_labels': len(soup.find_all('label')) > 0,
-                'heading_structure': len(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])) > 0
-            }
-            return features
+            return {name: check(document) for name, check in self._XP_ACCESSIBILITY.items()}
         except:
             return {}
     
-    def _has_seo_friendly_urls(self, soup: BeautifulSoup, base_url: str) -> bool:
+    def _has_seo_friendly_urls(self, path: str) -> bool:
         """Check if URLs are SEO-friendly"""
         try:
             # Check current URL
-            parsed_url = urlparse(base_url)
-            path = parsed_url.path.lower()
+            path = path.lower()
             
             # SEO-friendly indicators
             seo_indicators = [
                 '-' in path,  # Hyphens instead of underscores
                 not any(char in path for char in ['?', '&', '=']),  # No query parameters in path
                 len(path.split('/')) <= 5,  # Not too deep
-                not re.search(r'\d{4,}', path)  # No long numbers
+                not self._LONG_NUM_RE.search(path)  # No long numbers
             ]
             
             return sum(seo_indicators) >= 2
         except:
             return False
     
-    def _calculate_accessibility_score(self, soup: BeautifulSoup) -> float:
+    def _calculate_accessibility_score(self, counts: Dict[str, Any]) -> float:
         """Calculate accessibility score"""
-        try:
-            score = 0.0
-            max_score = 10.0
-            
-            # Alt text on images
-            images = soup.find_all('img')
-            if images:
-                images_with_alt = sum(1 for img in images if img.get('alt'))
-                score += (images_with_alt / len(images)) * 2.0
-            else:
-                score += 2.0  # No images is fine
-            
-            # Form labels
-            forms = soup.find_all('form')
-            if forms:
-                inputs = soup.find_all('input')
-                labels = soup.find_all('label')
-                if inputs and len(labels) >= len(inputs) * 0.8:
-                    score += 2.0
-            else:
-                score += 2.0  # No forms is fine
-            
-            # Heading structure
-            h1_tags = soup.find_all('h1')
-            if len(h1_tags) == 1:
-                score += 2.0
-            elif len(h1_tags) > 1:
-                score += 1.0
-            
-            # Language attribute
-            html_tag = soup.find('html')
-            if html_tag and html_tag.get('lang'):
+        score = 0.0
+        max_score = 10.0
+        
+        # Alt text on images
+        if counts['img_total']:
+            score += (counts['img_alt_text'] / counts['img_total']) * 2.0
+        else:
+            score += 2.0  # No images is fine
+        
+        # Form labels
+        if counts['form']:
+            inputs = counts['input']
+            if inputs and counts['label'] >= inputs * 0.8:
                 score += 2.0
-            
-            # Skip links
-            skip_links = soup.find_all('a', href=re.compile(r'^#'))
-            if skip_links:
-                score += 1.0
-            
-            # ARIA attributes
-            aria_elements = soup.find_all(attrs={'aria-label': True})
-            aria_elements += soup.find_all(attrs={'aria-labelledby': True})
-            if aria_elements:
-                score += 1.0
-            
-            return min(score / max_score, 1.0)
-            
-        except Exception:
-            return 0.0
+        else:
+            score += 2.0  # No forms is fine
+        
+        # Heading structure
+        if counts['h1'] == 1:
+            score += 2.0
+        elif counts['h1'] > 1:
+            score += 1.0
+        
+        # Language attribute
+        if counts['lang']:
+            score += 2.0
+        
+        # Skip links
+        if counts['a_fragment']:
+            score += 1.0
+        
+        # ARIA attributes
+        if counts['aria']:
+            score += 1.0
+        
+        return min(score / max_score, 1.0)
     
     def _calculate_performance_score(self, features: CrawlabilityFeatures, crawl_result: Dict[str, Any]) -> float:
         """Calculate performance score"""
+        score = 0.0
+        max_score = 10.0
+        
+        # Page load time
+        load_time = features.page_load_time
+        if load_time < 1.0:
+            score += 3.0
+        elif load_time < 2.0:
+            score += 2.0
+        elif load_time < 3.0:
+            score += 1.0
+        
+        # HTML size
+        html_size = features.html_size
+        if html_size < 50000:  # 50KB
+            score += 2.0
+        elif html_size < 100000:  # 100KB
+            score += 1.0
+        
+        # Resource optimization
+        if features.compression_enabled:
+            score += 1.0
+        
+        if features.cache_headers_present:
+            score += 1.0
+        
+        if features.lazy_loading_images > 0:
+            score += 1.0
+        
+        # External resources
+        total_external = features.external_scripts_count + features.external_stylesheets_count
+        if total_external < 5:
+            score += 1.0
+        elif total_external < 10:
+            score += 0.5
+        
+        # Inline resources (penalty)
+        if features.inline_css_count + features.inline_js_count < 3:
+            score += 1.0
+        
+        return min(score / max_score, 1.0)
+    
+    def score_batch(self, features_matrix: 'np.ndarray', weights: 'np.ndarray', max_score: float = 10.0) -> 'np.ndarray':
+        """Score many pages at once as a weighted sum of their indicator columns"""
+        return np.clip(features_matrix @ weights / max_score, 0.0, 1.0)
+    
+    def calculate_performance_scores(self, features: Union[List[CrawlabilityFeatures], 'FeatureBatch']) -> List[float]:
+        """Calculate performance scores for a batch of pages"""
+        if not len(features):
+            return []
+        if not NUMPY_AVAILABLE:
+            if isinstance(features, FeatureBatch):
+                raise ImportError("numpy is required to score a FeatureBatch (pip install numpy)")
+            return [self._calculate_performance_score(f, {}) for f in features]
+        
         try:
-            score = 0.0
-            max_score = 10.0
-            
-            # Page load time
-            load_time = features.page_load_time
-            if load_time < 1.0:
-                score += 3.0
-            elif load_time < 2.0:
-                score += 2.0
-            elif load_time < 3.0:
-                score += 1.0
-            
-            # HTML size
-            html_size = features.html_size
-            if html_size < 50000:  # 50KB
-                score += 2.0
-            elif html_size < 100000:  # 100KB
-                score += 1.0
-            
-            # Resource optimization
-            if features.compression_enabled:
-                score += 1.0
-            
-            if features.cache_headers_present:
-                score += 1.0
-            
-            if features.lazy_loading_images > 0:
-                score += 1.0
-            
-            # External resources
-            total_external = features.external_scripts_count + features.external_stylesheets_count
-            if total_external < 5:
-                score += 1.0
-            elif total_external < 10:
-                score += 0.5
-            
-            # Inline resources (penalty)
-            if features.inline_css_count + features.inline_js_count < 3:
-                score += 1.0
-            
-            return min(score / max_score, 1.0)
+            batch = features if isinstance(features, FeatureBatch) else FeatureBatch.from_objects(features)
+            external = batch.external_scripts_count + batch.external_stylesheets_count
+            inline = batch.inline_css_count + batch.inline_js_count
+            
+            # One column per branch of _calculate_performance_score, rows are pages
+            features_matrix = np.column_stack([
+                batch.page_load_time < 1.0,
+                (batch.page_load_time >= 1.0) & (batch.page_load_time < 2.0),
+                (batch.page_load_time >= 2.0) & (batch.page_load_time < 3.0),
+                batch.html_size < 50000,
+                (batch.html_size >= 50000) & (batch.html_size < 100000),
+                batch.flag('compression_enabled'),
+                batch.flag('cache_headers_present'),
+                batch.lazy_loading_images > 0,
+                external < 5,
+                (external >= 5) & (external < 10),
+                inline < 3
+            ]).astype(np.float64)
+            
+            weights = np.array(self._PERFORMANCE_WEIGHTS)
+            return self.score_batch(features_matrix, weights).tolist()
+        except Exception as e:
+            if isinstance(features, FeatureBatch):
+                raise
+            logger.warning(f"Vectorized scoring failed, falling back to per-page scoring: {e}")
+            return [self._calculate_performance_score(f, {}) for f in features]
+    
+    def calculate_seo_scores(self, features: Union[List[CrawlabilityFeatures], 'FeatureBatch']) -> List[float]:
+        """Calculate SEO scores for a batch of pages"""
+        if not len(features):
+            return []
+        if not NUMPY_AVAILABLE:
+            if isinstance(features, FeatureBatch):
+                raise ImportError("numpy is required to score a FeatureBatch (pip install numpy)")
+            return [self._calculate_seo_score(f, None) for f in features]
+        
+        try:
+            batch = features if isinstance(features, FeatureBatch) else FeatureBatch.from_objects(features)
+            title_len = batch.title_length
+            title_present = batch.flag('title_tag_present')
+            description_len = batch.meta_description_length
+            description_present = batch.flag('meta_description_present')
             
-        except Exception:
-            return 0.0
+            # Same ladders as _calculate_seo_score, evaluated for every page at once
+            score = np.where(
+                title_present & (title_len >= 30) & (title_len <= 60), 2.0,
+                np.where(title_present & (title_len > 0), 1.0, 0.0)
+            )
+            score += np.where(
+                description_present & (description_len >= 120) & (description_len <= 160), 2.0,
+                np.where(description_present & (description_len > 0), 1.0, 0.0)
+            )
+            score += np.where(batch.h1_count == 1, 1.0, np.where(batch.h1_count > 1, 0.5, 0.0))
+            score += batch.flag('canonical_tag_present')
+            score += batch.flag('structured_data_present')
+            score += batch.flag('open_graph_present')
+            score += batch.flag('mobile_friendly')
+            score += batch.flag('https_enabled')
+            
+            return np.minimum(score / 10.0, 1.0).tolist()
+        except Exception as e:
+            if isinstance(features, FeatureBatch):
+                raise
+            logger.warning(f"Vectorized scoring failed, falling back to per-page scoring: {e}")
+            return [self._calculate_seo_score(f, None) for f in features]
     
-    def _calculate_seo_score(self, features: CrawlabilityFeatures, soup: BeautifulSoup) -> float:
+    def _calculate_seo_score(self, features: CrawlabilityFeatures, document: Optional[lxml.html.HtmlElement]) -> float:
         """Calculate SEO score"""
-        try:
-            score = 0.0
-            max_score = 10.0
-            
-            # Title tag
-            if features.title_tag_present:
-                if 30 <= features.title_length <= 60:
-                    score += 2.0
-                elif features.title_length > 0:
-                    score += 1.0
-            
-            # Meta description
-            if features.meta_description_present:
-                if 120 <= features.meta_description_length <= 160:
-                    score += 2.0
-                elif features.meta_description_length > 0:
-                    score += 1.0
-            
-            # H1 tags
-            if features.h1_count == 1:
-                score += 1.0
-            elif features.h1_count > 1:
-                score += 0.5
-            
-            # Canonical tag
-            if features.canonical_tag_present:
-                score += 1.0
-            
-            # Structured data
-            if features.structured_data_present:
-                score += 1.0
-            
-            # Open Graph
-            if features.open_graph_present:
-                score += 1.0
-            
-            # Mobile friendly
-            if features.mobile_friendly:
+        score = 0.0
+        max_score = 10.0
+        
+        # Title tag
+        if features.title_tag_present:
+            if 30 <= features.title_length <= 60:
+                score += 2.0
+            elif features.title_length > 0:
                 score += 1.0
-            
-            # HTTPS
-            if features.https_enabled:
+        
+        # Meta description
+        if features.meta_description_present:
+            if 120 <= features.meta_description_length <= 160:
+                score += 2.0
+            elif features.meta_description_length > 0:
                 score += 1.0
-            
-            return min(score / max_score, 1.0)
-            
-        except Exception:
-            return 0.0
+        
+        # H1 tags
+        if features.h1_count == 1:
+            score += 1.0
+        elif features.h1_count > 1:
+            score += 0.5
+        
+        # Canonical tag
+        if features.canonical_tag_present:
+            score += 1.0
+        
+        # Structured data
+        if features.structured_data_present:
+            score += 1.0
+        
+        # Open Graph
+        if features.open_graph_present:
+            score += 1.0
+        
+        # Mobile friendly
+        if features.mobile_friendly:
+            score += 1.0
+        
+        # HTTPS
+        if features.https_enabled:
+            score += 1.0
+        
+        return min(score / max_score, 1.0)
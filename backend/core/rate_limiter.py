@@ -1,140 +1,329 @@
 """
-Production-grade rate limiter with sliding window algorithm
+Production-grade rate limiter with token bucket algorithm
 """
 
+import os
 import time
+import heapq
 import logging
-from typing import Dict, Any, Optional
-from collections import defaultdict, deque
+from typing import Dict, Any, List, Optional, Tuple
 import threading
 
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Atomic token bucket update: refill, try to spend one token, store and expire the bucket.
+# Time comes from the Redis server, so workers with skewed clocks share one timeline.
+# Returns {allowed (0/1), tokens left}; tokens are returned as a string to keep the fraction.
+_TOKEN_BUCKET_LUA = """
+if redis.replicate_commands then redis.replicate_commands() end
+local bucket = redis.call('HMGET', KEYS[1], 'tk', 'ts')
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = tonumber(bucket[1])
+local last_refill = tonumber(bucket[2])
+if tokens == nil or last_refill == nil then
+    tokens = capacity
+    last_refill = now
+end
+tokens = math.min(capacity, tokens + math.max(0, now - last_refill) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tk', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return {allowed, tostring(tokens)}
+"""
+
 class RateLimiter:
     """
-    Sliding window rate limiter for API endpoints
+    Token bucket rate limiter for API endpoints
     """
     
+    # Client IPs are spread over this many independently locked shards (power of two)
+    NUM_SHARDS = 32
+    
+    # Idle buckets each request may evict from its shard, keeping request latency flat
+    EVICTIONS_PER_REQUEST = 8
+    
     def __init__(self, max_requests: int = 100, window_seconds: int = 3600):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = defaultdict(deque)  # IP -> deque of timestamps
-        self.lock = threading.Lock()
+        # Buckets hold up to max_requests tokens and refill continuously over the window
+        self.refill_rate = max_requests / window_seconds
+        # Each shard holds a lock, its own IP -> (tokens, last_refill) map and a heap of
+        # (earliest time the bucket can be full again, IP) with one entry per tracked IP
+        self._shards = [(threading.Lock(), {}, []) for _ in range(self.NUM_SHARDS)]
         
         logger.info(f"🚦 Rate limiter initialized: {max_requests} requests per {window_seconds} seconds")
     
+    def _shard(self, client_ip: str):
+        """Get the (lock, buckets, expiry heap) shard that owns a client IP"""
+        return self._shards[hash(client_ip) & (self.NUM_SHARDS - 1)]
+    
+    def _refill(self, bucket: Optional[Tuple[float, float]], current_time: float) -> float:
+        """Get the tokens a bucket holds at current_time (new clients start full)"""
+        if bucket is None:
+            return float(self.max_requests)
+        tokens, last_refill = bucket
+        return min(self.max_requests, tokens + (current_time - last_refill) * self.refill_rate)
+    
+    def _full_at(self, bucket: Tuple[float, float]) -> float:
+        """Get the time at which a bucket will have refilled completely"""
+        tokens, last_refill = bucket
+        return last_refill + (self.max_requests - tokens) / self.refill_rate
+    
+    def _evict_expired(self, buckets: Dict[str, Tuple[float, float]], expiry_heap: List[Tuple[float, str]],
+                       current_time: float, limit: Optional[int] = None) -> int:
+        """Drop fully refilled buckets whose recorded expiry has passed (caller holds the shard lock)"""
+        removed = 0
+        while expiry_heap and expiry_heap[0][0] <= current_time and limit != 0:
+            _, ip = heapq.heappop(expiry_heap)
+            full_at = self._full_at(buckets[ip])
+            
+            # A fully refilled bucket is indistinguishable from a new client
+            if full_at <= current_time:
+                del buckets[ip]
+                removed += 1
+            else:
+                # Requests since the entry was pushed delayed the expiry
+                heapq.heappush(expiry_heap, (full_at, ip))
+            
+            if limit is not None:
+                limit -= 1
+        return removed
+    
     def allow_request(self, client_ip: str) -> bool:
         """
         Check if request is allowed for given client IP
         """
+        lock, buckets, expiry_heap = self._shard(client_ip)
+        with lock:
+            current_time = time.time()
+            # Idle clients age out as traffic flows, without waiting for cleanup_old_entries
+            self._evict_expired(buckets, expiry_heap, current_time, self.EVICTIONS_PER_REQUEST)
+            bucket = buckets.get(client_ip)
+            tokens = self._refill(bucket, current_time)
+            
+            # Spend a token if one is available
+            if tokens >= 1:
+                buckets[client_ip] = (tokens - 1, current_time)
+                if bucket is None:
+                    # Later requests only push the expiry back; eviction reschedules lazily
+                    heapq.heappush(expiry_heap, (self._full_at(buckets[client_ip]), client_ip))
+                return True
+            else:
+                buckets[client_ip] = (tokens, current_time)
+                logger.warning(f"⚠️ Rate limit exceeded for IP: {client_ip}")
+                return False
+    
+    def get_remaining_requests(self, client_ip: str) -> int:
+        """
+        Get remaining requests for client IP
+        """
+        lock, buckets, _ = self._shard(client_ip)
+        with lock:
+            return int(self._refill(buckets.get(client_ip), time.time()))
+    
+    def get_reset_time(self, client_ip: str) -> Optional[float]:
+        """
+        Get time when the next request will be allowed for client IP
+        """
+        lock, buckets, _ = self._shard(client_ip)
+        with lock:
+            bucket = buckets.get(client_ip)
+            if bucket:
+                tokens, last_refill = bucket
+                return last_refill + max(0.0, 1 - tokens) / self.refill_rate
+            return None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get rate limiter statistics
+        """
         try:
-            with self.lock:
-                current_time = time.time()
-                client_requests = self.requests[client_ip]
-                
-                # Remove old requests outside the window
-                while client_requests and client_requests[0] <= current_time - self.window_seconds:
-                    client_requests.popleft()
+            current_time = time.time()
+            active_clients = 0
+            total_requests = 0
+            tracked_ips = 0
+            
+            for lock, buckets, _ in self._shards:
+                with lock:
+                    for bucket in buckets.values():
+                        # Clients whose bucket has not refilled still count as active
+                        used = self.max_requests - self._refill(bucket, current_time)
+                        if used > 0:
+                            active_clients += 1
+                            total_requests += round(used)
+                    
+                    tracked_ips += len(buckets)
+            
+            return {
+                "max_requests_per_window": self.max_requests,
+                "window_seconds": self.window_seconds,
+                "active_clients": active_clients,
+                "total_active_requests": total_requests,
+                "total_tracked_ips": tracked_ips
+            }
                 
-                # Check if under limit
-                if len(client_requests) < self.max_requests:
-                    client_requests.append(current_time)
-                    return True
-                else:
-                    logger.warning(f"⚠️ Rate limit exceeded for IP: {client_ip}")
-                    return False
+        except Exception as e:
+            logger.error(f"❌ Failed to get rate limiter stats: {str(e)}")
+            return {}
+    
+    def cleanup_old_entries(self):
+        """
+        Clean up every expired entry (requests already evict a few from their own shard)
+        """
+        try:
+            current_time = time.time()
+            removed = 0
+            
+            for lock, buckets, expiry_heap in self._shards:
+                with lock:
+                    removed += self._evict_expired(buckets, expiry_heap, current_time)
+            
+            if removed:
+                logger.info(f"🧹 Cleaned up {removed} old rate limiter entries")
                     
         except Exception as e:
-            logger.error(f"❌ Rate limiter error: {str(e)}")
+            logger.error(f"❌ Rate limiter cleanup failed: {str(e)}")
+
+
+class RedisRateLimiter:
+    """
+    Token bucket rate limiter shared by every worker through Redis
+    """
+    
+    def __init__(self, max_requests: int = 100, window_seconds: int = 3600,
+                 redis_url: Optional[str] = None, key_prefix: str = "ratelimit:"):
+        if not REDIS_AVAILABLE:
+            raise ImportError("redis is required for RedisRateLimiter (pip install redis)")
+        
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.refill_rate = max_requests / window_seconds
+        self.key_prefix = key_prefix
+        # An idle bucket is full again after one window, so it can expire then
+        self.bucket_ttl_ms = int(window_seconds * 1000)
+        
+        self.redis_url = redis_url or os.getenv('REDIS_URL', 'redis://localhost:6379')
+        self._redis = aioredis.from_url(self.redis_url)
+        # Runs via EVALSHA, loading the script on first use
+        self._token_bucket = self._redis.register_script(_TOKEN_BUCKET_LUA)
+        
+        logger.info(f"🚦 Redis rate limiter initialized: {max_requests} requests per {window_seconds} seconds")
+    
+    async def allow_request(self, client_ip: str) -> bool:
+        """
+        Check if request is allowed for given client IP
+        """
+        try:
+            allowed, _ = await self._token_bucket(
+                keys=[self.key_prefix + client_ip],
+                args=[self.refill_rate, self.max_requests, self.bucket_ttl_ms]
+            )
+            if allowed:
+                return True
+            
+            logger.warning(f"⚠️ Rate limit exceeded for IP: {client_ip}")
+            return False
+            
+        except Exception as e:
+            logger.error(f"❌ Redis rate limiter error: {str(e)}")
             return True  # Allow request on error
     
-    def get_remaining_requests(self, client_ip: str) -> int:
+    async def _server_time(self) -> float:
+        """Get the Redis server clock, the timeline bucket timestamps are recorded on"""
+        seconds, microseconds = await self._redis.time()
+        return seconds + microseconds / 1e6
+    
+    def _refill(self, tokens: bytes, last_refill: bytes, current_time: float) -> float:
+        """Get the tokens a stored bucket holds at current_time"""
+        elapsed = max(0.0, current_time - float(last_refill))
+        return min(self.max_requests, float(tokens) + elapsed * self.refill_rate)
+    
+    async def get_remaining_requests(self, client_ip: str) -> int:
         """
         Get remaining requests for client IP
         """
         try:
-            with self.lock:
-                current_time = time.time()
-                client_requests = self.requests[client_ip]
-                
-                # Remove old requests
-                while client_requests and client_requests[0] <= current_time - self.window_seconds:
-                    client_requests.popleft()
-                
-                return max(0, self.max_requests - len(client_requests))
-                
+            tokens, last_refill = await self._redis.hmget(self.key_prefix + client_ip, 'tk', 'ts')
+            if tokens is None or last_refill is None:
+                return self.max_requests
+            
+            return int(self._refill(tokens, last_refill, await self._server_time()))
+            
         except Exception:
             return self.max_requests
     
-    def get_reset_time(self, client_ip: str) -> Optional[float]:
+    async def get_reset_time(self, client_ip: str) -> Optional[float]:
         """
-        Get time when rate limit resets for client IP
+        Get time when the next request will be allowed for client IP
         """
         try:
-            with self.lock:
-                client_requests = self.requests[client_ip]
-                if client_requests:
-                    return client_requests[0] + self.window_seconds
+            tokens, last_refill = await self._redis.hmget(self.key_prefix + client_ip, 'tk', 'ts')
+            if tokens is None or last_refill is None:
                 return None
-                
+            
+            return float(last_refill) + max(0.0, 1 - float(tokens)) / self.refill_rate
+            
         except Exception:
             return None
     
-    def get_stats(self) -> Dict[str, Any]:
+    async def get_stats(self) -> Dict[str, Any]:
         """
-        Get rate limiter statistics
+        Get rate limiter statistics (scans every bucket key, so keep it off hot paths)
         """
         try:
-            with self.lock:
-                current_time = time.time()
-                active_clients = 0
-                total_requests = 0
-                
-                for client_ip, client_requests in self.requests.items():
-                    # Remove old requests
-                    while client_requests and client_requests[0] <= current_time - self.window_seconds:
-                        client_requests.popleft()
-                    
-                    if client_requests:
-                        active_clients += 1
-                        total_requests += len(client_requests)
-                
-                return {
-                    "max_requests_per_window": self.max_requests,
-                    "window_seconds": self.window_seconds,
-                    "active_clients": active_clients,
-                    "total_active_requests": total_requests,
-                    "total_tracked_ips": len(self.requests)
-                }
+            keys = [key async for key in self._redis.scan_iter(match=f"{self.key_prefix}*", count=1000)]
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.hmget(key, 'tk', 'ts')
+                buckets = await pipe.execute()
+            
+            current_time = await self._server_time()
+            active_clients = 0
+            total_requests = 0
+            tracked_ips = 0
+            
+            for tokens, last_refill in buckets:
+                if tokens is None or last_refill is None:
+                    # Expired between the scan and the read
+                    continue
+                tracked_ips += 1
                 
+                # Clients whose bucket has not refilled still count as active
+                used = self.max_requests - self._refill(tokens, last_refill, current_time)
+                if used > 0:
+                    active_clients += 1
+                    total_requests += round(used)
+            
+            return {
+                "max_requests_per_window": self.max_requests,
+                "window_seconds": self.window_seconds,
+                "active_clients": active_clients,
+                "total_active_requests": total_requests,
+                "total_tracked_ips": tracked_ips
+            }
+            
         except Exception as e:
             logger.error(f"❌ Failed to get rate limiter stats: {str(e)}")
             return {}
     
-    def cleanup_old_entries(self):
+    async def cleanup_old_entries(self):
         """
-        Clean up old entries to prevent memory leaks
+        Nothing to do: Redis expires each bucket once it could have refilled completely
         """
-        try:
-            with self.lock:
-                current_time = time.time()
-                ips_to_remove = []
-                
-                for client_ip, client_requests in self.requests.items():
-                    # Remove old requests
-                    while client_requests and client_requests[0] <= current_time - self.window_seconds:
-                        client_requests.popleft()
-                    
-                    # Mark empty deques for removal
-                    if not client_requests:
-                        ips_to_remove.append(client_ip)
-                
-                # Remove empty entries
-                for ip in ips_to_remove:
-                    del self.requests[ip]
-                
-                if ips_to_remove:
-                    logger.info(f"🧹 Cleaned up {len(ips_to_remove)} old rate limiter entries")
-                    
-        except Exception as e:
-            logger.error(f"❌ Rate limiter cleanup failed: {str(e)}")
+    
+    async def close(self):
+        """Close the Redis connection pool"""
+        await self._redis.close()
@@ -4,95 +4,139 @@ URL validation and verification system with Google Search integration
 
 import asyncio
 import aiohttp
+import functools
 import logging
 import re
 import os
-from typing import Dict, Any, List, Optional, Tuple
+import time
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from urllib.parse import urlparse, urljoin
+from collections import OrderedDict
 from datetime import datetime, timedelta
 import json
 import ssl
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from models.schemas import ValidationResult, GoogleSearchResult, URLVerificationResult
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Built once; creating a default SSL context loads the system CA store
+_SHARED_SSL_CTX = ssl.create_default_context()
+
+# Suspicious-domain indicators
+_LONG_NUM_RE = re.compile(r'\d{4,}')
+_NON_DNS_RE = re.compile(r'[^a-zA-Z0-9.-]')
+
 class URLValidator:
     """
     Advanced URL validator with Google Search integration for real website verification
     """
     
+    CUSTOM_SEARCH_URL = 'https://www.googleapis.com/customsearch/v1'
+    
+    # Statuses servers return when they don't support HEAD; the check retries with GET
+    _HEAD_FALLBACK_STATUSES = frozenset({403, 405, 501})
+    
+    # Positive Google verifications are reused per domain for this long (seconds), LRU-bounded
+    VERIFICATION_CACHE_TTL = 86400
+    VERIFICATION_CACHE_SIZE = 10000
+    
+    # Concurrent validations during batch validation, overall and per host
+    BATCH_CONCURRENCY = 20
+    BATCH_CONCURRENCY_PER_HOST = 5
+    
+    # Common fake/suspicious URL patterns
+    FAKE_URL_PATTERNS = (
+        r'bit\.ly',
+        r'tinyurl\.com',
+        r'goo\.gl',
+        r't\.co',
+        r'ow\.ly',
+        r'is\.gd',
+        r'buff\.ly',
+        r'adf\.ly',
+        r'short\.link',
+        r'tiny\.cc',
+        r'rb\.gy',
+        r'cutt\.ly',
+        r'[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}',  # IP addresses
+        r'localhost',
+        r'127\.0\.0\.1',
+        r'192\.168\.',
+        r'10\.',
+        r'172\.(1[6-9]|2[0-9]|3[0-1])\.',
+        r'[a-z0-9]{10,}\.com',  # Random character domains
+        r'[a-z0-9]{10,}\.net',
+        r'[a-z0-9]{10,}\.org',
+        r'test\.',
+        r'example\.',
+        r'sample\.',
+        r'demo\.',
+        r'fake\.',
+        r'phishing\.',
+        r'malware\.',
+        r'spam\.'
+    )
+    
+    # Trusted domain patterns
+    TRUSTED_PATTERNS = (
+        r'amazon\.(com|in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'google\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'microsoft\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'apple\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'facebook\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'twitter\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'linkedin\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'youtube\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'instagram\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
+        r'github\.(com|io)',
+        r'stackoverflow\.com',
+        r'wikipedia\.org',
+        r'reddit\.com',
+        r'medium\.com',
+        r'wordpress\.(com|org)',
+        r'shopify\.com',
+        r'wix\.com',
+        r'squarespace\.com'
+    )
+    
+    # Each pattern list compiled once into a single alternation, so a domain is scanned once
+    _FAKE_URL_RE = re.compile('|'.join(f'(?:{p})' for p in FAKE_URL_PATTERNS), re.IGNORECASE)
+    _TRUSTED_RE = re.compile('|'.join(f'(?:{p})' for p in TRUSTED_PATTERNS), re.IGNORECASE)
+    
+    __slots__ = (
+        'google_api_key', 'google_search_engine_id', 'lighthouse_path', 'search_enabled',
+        '_session', '_search_semaphore', '_verification_cache', '_verification_inflight'
+    )
+    
     def __init__(self):
         self.google_api_key = os.getenv('GOOGLE_API_KEY')
         self.google_search_engine_id = os.getenv('GOOGLE_SEARCH_ENGINE_ID')
         self.lighthouse_path = os.getenv('LIGHTHOUSE_PATH')
         
-        # Initialize Google Search API
-        self.search_service = None
-        if self.google_api_key and self.google_search_engine_id:
-            try:
-                self.search_service = build('customsearch', 'v1', developerKey=self.google_api_key)
-                logger.info("✅ Google Search API initialized")
-            except Exception as e:
-                logger.warning(f"⚠️ Google Search API initialization failed: {e}")
-        
-        # Common fake/suspicious URL patterns
-        self.fake_url_patterns = [
-            r'bit\.ly',
-            r'tinyurl\.com',
-            r'goo\.gl',
-            r't\.co',
-            r'ow\.ly',
-            r'is\.gd',
-            r'buff\.ly',
-            r'adf\.ly',
-            r'short\.link',
-            r'tiny\.cc',
-            r'rb\.gy',
-            r'cutt\.ly',
-            r'[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}',  # IP addresses
-            r'localhost',
-            r'127\.0\.0\.1',
-            r'192\.168\.',
-            r'10\.',
-            r'172\.(1[6-9]|2[0-9]|3[0-1])\.',
-            r'[a-z0-9]{10,}\.com',  # Random character domains
-            r'[a-z0-9]{10,}\.net',
-            r'[a-z0-9]{10,}\.org',
-            r'test\.',
-            r'example\.',
-            r'sample\.',
-            r'demo\.',
-            r'fake\.',
-            r'phishing\.',
-            r'malware\.',
-            r'spam\.'
-        ]
-        
-        # Trusted domain patterns
-        self.trusted_patterns = [
-            r'amazon\.(com|in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'google\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'microsoft\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'apple\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'facebook\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'twitter\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'linkedin\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'youtube\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'instagram\.(com|co\.in|co\.uk|de|fr|it|es|ca|com\.au|com\.br|com\.mx)',
-            r'github\.(com|io)',
-            r'stackoverflow\.com',
-            r'wikipedia\.org',
-            r'reddit\.com',
-            r'medium\.com',
-            r'wordpress\.(com|org)',
-            r'shopify\.com',
-            r'wix\.com',
-            r'squarespace\.com'
-        ]
+        # Google Custom Search is called over the JSON REST endpoint with a shared session
+        self.search_enabled = bool(self.google_api_key and self.google_search_engine_id)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Caps concurrent Custom Search calls across all validations
+        self._search_semaphore = asyncio.Semaphore(4)
+        # domain -> (verified at, result), oldest use first; plus verifications still running
+        self._verification_cache: "OrderedDict[str, Tuple[float, URLVerificationResult]]" = OrderedDict()
+        self._verification_inflight: Dict[str, asyncio.Future] = {}
+        if self.search_enabled:
+            logger.info("✅ Google Search API initialized")
+    
+    async def __aenter__(self) -> "URLValidator":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
     
     async def validate_url(self, url: str) -> ValidationResult:
         """
@@ -109,8 +153,11 @@ class URLValidator:
                     error="Invalid URL format"
                 )
             
+            # Domain checks below all work on the parsed host
+            domain = urlparse(normalized_url).netloc.lower()
+            
             # Check for fake/suspicious patterns
-            if self._is_suspicious_url(normalized_url):
+            if self._is_suspicious_url(domain):
                 logger.warning(f"⚠️ Suspicious URL detected: {normalized_url}")
                 return ValidationResult(
                     is_valid=False,
@@ -128,13 +175,22 @@ class URLValidator:
                     status_code=accessibility_result.get('status_code', 0)
                 )
             
-            # Verify with Google Search (if available)
-            verification_result = await self._verify_with_google_search(normalized_url)
+            # Verify with Google Search (if available); trusted domains need no search round trip
+            is_trusted = self._is_trusted_domain(domain)
+            if is_trusted:
+                verification_result = URLVerificationResult(
+                    is_real=True,
+                    is_indexed=False,
+                    verification_method="trusted_domain",
+                    confidence=0.9
+                )
+            else:
+                verification_result = await self._verify_with_google_search(domain)
             
             # Final validation decision
             is_valid = (
                 accessibility_result['accessible'] and
-                (verification_result.is_real or self._is_trusted_domain(normalized_url))
+                (verification_result.is_real or is_trusted)
             )
             
             if not is_valid and not verification_result.is_real:
@@ -165,14 +221,10 @@ class URLValidator:
         try:
             url = url.strip()
             
-            # Remove common tracking parameters
-            parsed = urlparse(url)
-            
             # Add protocol if missing
             if not url.startswith(('http://', 'https://')):
                 url = 'https://' + url
             
-            # Parse again after adding protocol
             parsed = urlparse(url)
             
             # Basic validation
@@ -190,24 +242,20 @@ class URLValidator:
         except Exception:
             return None
     
-    def _is_suspicious_url(self, url: str) -> bool:
-        """Check if URL matches suspicious patterns"""
+    def _is_suspicious_url(self, domain: str) -> bool:
+        """Check if a (lowercased) domain matches suspicious patterns"""
         try:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower()
-            
             # Check against fake URL patterns
-            for pattern in self.fake_url_patterns:
-                if re.search(pattern, domain, re.IGNORECASE):
-                    return True
+            if self._FAKE_URL_RE.search(domain):
+                return True
             
             # Check for suspicious characteristics
             suspicious_indicators = [
                 len(domain) > 50,  # Very long domain
                 domain.count('-') > 3,  # Too many hyphens
                 domain.count('.') > 3,  # Too many subdomains
-                re.search(r'\d{4,}', domain),  # Long numbers in domain
-                re.search(r'[^a-zA-Z0-9.-]', domain),  # Special characters
+                _LONG_NUM_RE.search(domain) is not None,  # Long numbers in domain
+                _NON_DNS_RE.search(domain) is not None,  # Special characters
                 domain.startswith('www.') and len(domain.replace('www.', '')) < 4,  # Very short domain
             ]
             
@@ -216,17 +264,13 @@ class URLValidator:
         except Exception:
             return False
     
-    def _is_trusted_domain(self, url: str) -> bool:
-        """Check if URL is from a trusted domain"""
+    # Trusted-domain checks repeat across batches, so memoize them per domain
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _is_trusted_domain(domain: str) -> bool:
+        """Check if a (lowercased) domain is trusted"""
         try:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower()
-            
-            for pattern in self.trusted_patterns:
-                if re.search(pattern, domain, re.IGNORECASE):
-                    return True
-            
-            return False
+            return bool(URLValidator._TRUSTED_RE.search(domain))
             
         except Exception:
             return False
@@ -234,39 +278,25 @@ class URLValidator:
     async def _check_url_accessibility(self, url: str) -> Dict[str, Any]:
         """Check if URL is accessible"""
         try:
-            timeout = aiohttp.ClientTimeout(total=15, connect=10)
-            redirect_chain = []
+            session = await self._get_session()
             
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                try:
-                    async with session.get(url, allow_redirects=True) as response:
-                        # Track redirect chain
-                        for redirect in response.history:
-                            redirect_chain.append(str(redirect.url))
-                        redirect_chain.append(str(response.url))
-                        
-                        if response.status == 200:
-                            return {
-                                'accessible': True,
-                                'status_code': response.status,
-                                'redirect_chain': redirect_chain,
-                                'final_url': str(response.url)
-                            }
-                        else:
-                            return {
-                                'accessible': False,
-                                'status_code': response.status,
-                                'error': f"HTTP {response.status}",
-                                'redirect_chain': redirect_chain
-                            }
-                            
-                except aiohttp.ClientError as e:
-                    return {
-                        'accessible': False,
-                        'error': f"Connection failed: {str(e)}",
-                        'status_code': 0
-                    }
+            try:
+                # HEAD gives the status and redirect chain without downloading the body
+                async with session.head(url, allow_redirects=True) as response:
+                    if response.status not in self._HEAD_FALLBACK_STATUSES:
+                        return self._accessibility_result(response)
+                
+                # Some servers reject HEAD; retry with a full GET
+                async with session.get(url, allow_redirects=True) as response:
+                    return self._accessibility_result(response)
                     
+            except aiohttp.ClientError as e:
+                return {
+                    'accessible': False,
+                    'error': f"Connection failed: {str(e)}",
+                    'status_code': 0
+                }
+                
         except Exception as e:
             return {
                 'accessible': False,
@@ -274,10 +304,60 @@ class URLValidator:
                 'status_code': 0
             }
     
-    async def _verify_with_google_search(self, url: str) -> URLVerificationResult:
-        """Verify URL using Google Search API"""
+    def _accessibility_result(self, response: aiohttp.ClientResponse) -> Dict[str, Any]:
+        """Build the accessibility result from a (HEAD or GET) response"""
+        # Track redirect chain
+        redirect_chain = [str(redirect.url) for redirect in response.history]
+        redirect_chain.append(str(response.url))
+        
+        if response.status == 200:
+            return {
+                'accessible': True,
+                'status_code': response.status,
+                'redirect_chain': redirect_chain,
+                'final_url': str(response.url)
+            }
+        else:
+            return {
+                'accessible': False,
+                'status_code': response.status,
+                'error': f"HTTP {response.status}",
+                'redirect_chain': redirect_chain
+            }
+    
+    async def _verify_with_google_search(self, domain: str) -> URLVerificationResult:
+        """Verify a domain, reusing a recent Google Search verification when there is one"""
+        cached = self._verification_cache.get(domain)
+        if cached is not None:
+            verified_at, result = cached
+            if time.monotonic() - verified_at < self.VERIFICATION_CACHE_TTL:
+                self._verification_cache.move_to_end(domain)
+                return result
+            del self._verification_cache[domain]
+        
+        # Concurrent validations of one domain share a single round of queries
+        task = self._verification_inflight.get(domain)
+        if task is None:
+            task = asyncio.ensure_future(self._query_google_search(domain))
+            self._verification_inflight[domain] = task
+            task.add_done_callback(lambda _: self._verification_inflight.pop(domain, None))
+        
+        # Shielded so one cancelled validation doesn't abort the others waiting on it
+        result = await asyncio.shield(task)
+        
+        # Failed queries and unconfirmed domains are retried on the next validation
+        if result.verification_method == "google_search" and result.is_real:
+            self._verification_cache[domain] = (time.monotonic(), result)
+            self._verification_cache.move_to_end(domain)
+            if len(self._verification_cache) > self.VERIFICATION_CACHE_SIZE:
+                self._verification_cache.popitem(last=False)
+        
+        return result
+    
+    async def _query_google_search(self, domain: str) -> URLVerificationResult:
+        """Verify a domain using Google Search API"""
         try:
-            if not self.search_service:
+            if not self.search_enabled:
                 logger.warning("⚠️ Google Search API not available")
                 return URLVerificationResult(
                     is_real=True,  # Assume real if can't verify
@@ -286,9 +366,6 @@ class URLValidator:
                     confidence=0.5
                 )
             
-            parsed = urlparse(url)
-            domain = parsed.netloc
-            
             # Search for the domain
             search_queries = [
                 f'site:{domain}',
@@ -299,46 +376,39 @@ class URLValidator:
             all_results = []
             is_indexed = False
             
-            for query in search_queries:
-                try:
-                    result = self.search_service.cse().list(
-                        q=query,
-                        cx=self.google_search_engine_id,
-                        num=10
-                    ).execute()
-                    
-                    if 'items' in result:
-                        for item in result['items']:
-                            search_result = GoogleSearchResult(
-                                title=item.get('title', ''),
-                                link=item.get('link', ''),
-                                snippet=item.get('snippet', ''),
-                                position=len(all_results) + 1
-                            )
-                            all_results.append(search_result)
-                            
-                            # Check if exact domain is indexed
-                            if domain.lower() in item.get('link', '').lower():
-                                is_indexed = True
-                    
-                    # Small delay between requests
-                    await asyncio.sleep(0.1)
+            def collect(result: Optional[Dict[str, Any]]) -> bool:
+                """Append a query's items to all_results; True if the exact domain was hit"""
+                domain_hit = False
+                for item in (result or {}).get('items', []):
+                    all_results.append(GoogleSearchResult(
+                        title=item.get('title', ''),
+                        link=item.get('link', ''),
+                        snippet=item.get('snippet', ''),
+                        position=len(all_results) + 1
+                    ))
                     
-                except HttpError as e:
-                    logger.warning(f"⚠️ Google Search API error: {e}")
-                    continue
-                except Exception as e:
-                    logger.warning(f"⚠️ Search query failed: {e}")
-                    continue
+                    # Check if exact domain is indexed
+                    if domain in item.get('link', '').lower():
+                        domain_hit = True
+                return domain_hit
+            
+            # The site: query alone confirms indexing; only fall back to the broader
+            # queries (run concurrently) when it doesn't
+            is_indexed = collect(await self._run_search_query(search_queries[0]))
+            if not is_indexed:
+                results = await asyncio.gather(*(self._run_search_query(q) for q in search_queries[1:]))
+                for result in results:
+                    is_indexed = collect(result) or is_indexed
             
             # Determine if website is real based on search results
-            is_real = len(all_results) > 0 or is_indexed or self._is_trusted_domain(url)
+            is_trusted = self._is_trusted_domain(domain)
+            is_real = len(all_results) > 0 or is_indexed or is_trusted
             
             # Calculate confidence
             confidence = min(1.0, len(all_results) / 10.0)
             if is_indexed:
                 confidence = max(confidence, 0.8)
-            if self._is_trusted_domain(url):
+            if is_trusted:
                 confidence = max(confidence, 0.9)
             
             logger.info(f"🔍 Google verification: {domain} - Real: {is_real}, Indexed: {is_indexed}, Results: {len(all_results)}")
@@ -360,31 +430,87 @@ class URLValidator:
                 confidence=0.5
             )
     
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=10,
+                ttl_dns_cache=300,
+                ssl=_SHARED_SSL_CTX
+            )
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=15, connect=10),
+                connector=connector
+            )
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the shared session and its connector (call on application shutdown)"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _run_search_query(self, query: str) -> Optional[Dict[str, Any]]:
+        """Run one Custom Search query; None if it fails"""
+        try:
+            params = {
+                'q': query,
+                'cx': self.google_search_engine_id,
+                'key': self.google_api_key,
+                'num': 10
+            }
+            session = await self._get_session()
+            async with self._search_semaphore:
+                async with session.get(self.CUSTOM_SEARCH_URL, params=params) as response:
+                    if response.status != 200:
+                        logger.warning(f"⚠️ Google Search API error: HTTP {response.status}")
+                        return None
+                    return await response.json(loads=orjson.loads if ORJSON_AVAILABLE else json.loads)
+                
+        except Exception as e:
+            logger.warning(f"⚠️ Search query failed: {e}")
+            return None
+    
+    async def iter_validate_urls(self, urls: List[str]) -> AsyncIterator[Tuple[int, ValidationResult]]:
+        """Validate multiple URLs concurrently, yielding (index, result) as each one finishes"""
+        batch_semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+        host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
+        async def validate_with_semaphore(index, url):
+            normalized_url = self._normalize_url(url)
+            host = urlparse(normalized_url).netloc.lower() if normalized_url else ''
+            if host not in host_semaphores:
+                host_semaphores[host] = asyncio.Semaphore(self.BATCH_CONCURRENCY_PER_HOST)
+            
+            # Take the host slot first, so URLs queued behind a busy host don't hold batch slots
+            async with host_semaphores[host], batch_semaphore:
+                try:
+                    return index, await self.validate_url(url)
+                except Exception as e:
+                    return index, ValidationResult(
+                        is_valid=False,
+                        error=f"Validation failed: {str(e)}"
+                    )
+        
+        tasks = [asyncio.ensure_future(validate_with_semaphore(i, url)) for i, url in enumerate(urls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer stopped early (or failed); don't leave validations running
+            for task in tasks:
+                task.cancel()
+    
     async def batch_validate_urls(self, urls: List[str]) -> List[ValidationResult]:
         """Validate multiple URLs concurrently"""
         try:
             logger.info(f"🔄 Batch validating {len(urls)} URLs")
             
-            # Limit concurrent requests
-            semaphore = asyncio.Semaphore(5)
-            
-            async def validate_with_semaphore(url):
-                async with semaphore:
-                    return await self.validate_url(url)
-            
-            tasks = [validate_with_semaphore(url) for url in urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Handle exceptions
-            validated_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    validated_results.append(ValidationResult(
-                        is_valid=False,
-                        error=f"Validation failed: {str(result)}"
-                    ))
-                else:
-                    validated_results.append(result)
+            # Results arrive in completion order; slot them back into input order
+            validated_results: List[Optional[ValidationResult]] = [None] * len(urls)
+            async for index, result in self.iter_validate_urls(urls):
+                validated_results[index] = result
             
             logger.info(f"✅ Batch validation completed: {len(validated_results)} results")
             return validated_results
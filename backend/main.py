@@ -1,16 +1,33 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
 import asyncio
+import functools
 import logging
-from typing import List
+import os
+from typing import List, Tuple
 from datetime import datetime
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Neurom Website Analyzer API", version="1.0.0")
+# Artificial /analyze latency for frontend demos; off unless SIMULATE_DELAY_MS is set
+SIMULATE_DELAY_MS = float(os.getenv('SIMULATE_DELAY_MS', '0'))
+
+# Responses are encoded with orjson when it is installed
+app = FastAPI(
+    title="Neurom Website Analyzer API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
+)
 
 # CORS middleware - Allow all origins for development
 app.add_middleware(
@@ -45,108 +62,117 @@ class AnalysisResult(BaseModel):
     modules: List[ModuleResult]
     analysis_time: float
 
-def generate_mock_analysis(url: str) -> AnalysisResult:
-    """Generate mock analysis results for testing"""
-    
-    # Simple hash-based scoring for consistency
-    url_hash = hash(url) % 100
+# Static part of each mock module: (name, score offset from the base score, description,
+# explanation, recommendation). Built once; recommendations are shared by every response
+_MODULE_SPECS = [
+    (
+        "SEO & Metadata",
+        5,
+        "Search engine optimization and meta tags analysis",
+        "SEO analysis shows good optimization with proper meta tags and content structure.",
+        Recommendation(
+            priority="Medium",
+            title="Optimize Meta Description",
+            message="Consider improving meta description length for better search results display.",
+            code_snippet='<meta name="description" content="Optimized description (120-160 chars)">',
+            doc_link="https://developers.google.com/search/docs/appearance/snippet"
+        )
+    ),
+    (
+        "Performance",
+        -10,
+        "Website speed and performance metrics",
+        "Performance analysis shows room for improvement in loading speed and optimization.",
+        Recommendation(
+            priority="High",
+            title="Optimize Images",
+            message="Compress and properly format images to reduce loading times.",
+            code_snippet='<img src="image.webp" alt="Description" loading="lazy">',
+            doc_link="https://web.dev/fast/#optimize-your-images"
+        )
+    ),
+    (
+        "Security",
+        15,
+        "HTTPS and security implementation",
+        "Security analysis shows good HTTPS implementation with room for header improvements.",
+        Recommendation(
+            priority="Medium",
+            title="Add Security Headers",
+            message="Implement additional security headers for better protection.",
+            code_snippet="Strict-Transport-Security: max-age=31536000; includeSubDomains",
+            doc_link="https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers#security"
+        )
+    ),
+    (
+        "Mobile Friendliness",
+        8,
+        "Mobile device compatibility and usability",
+        "Mobile analysis shows good responsive design with minor optimization opportunities.",
+        Recommendation(
+            priority="Low",
+            title="Optimize Touch Targets",
+            message="Ensure all interactive elements are properly sized for touch interaction.",
+            code_snippet='.touch-target { min-height: 44px; min-width: 44px; }',
+            doc_link="https://web.dev/accessible-tap-targets/"
+        )
+    ),
+    (
+        "Crawlability",
+        -5,
+        "Search engine crawling accessibility",
+        "Crawlability analysis shows good structure with some areas for improvement.",
+        Recommendation(
+            priority="Medium",
+            title="Optimize Robots.txt",
+            message="Review and optimize robots.txt file for better crawling guidance.",
+            code_snippet="User-agent: *\nAllow: /\nSitemap: https://yoursite.com/sitemap.xml",
+            doc_link="https://developers.google.com/search/docs/crawling-indexing/robots/intro"
+        )
+    ),
+    (
+        "Indexing",
+        2,
+        "Search engine indexing optimization",
+        "Indexing analysis shows proper setup with opportunities for canonical tag optimization.",
+        Recommendation(
+            priority="Medium",
+            title="Add Canonical Tags",
+            message="Implement canonical tags to prevent duplicate content issues.",
+            code_snippet='<link rel="canonical" href="https://example.com/preferred-url">',
+            doc_link="https://developers.google.com/search/docs/crawling-indexing/consolidate-duplicate-urls"
+        )
+    )
+]
+
+@functools.lru_cache(maxsize=100)
+def _mock_template(url_hash: int) -> Tuple[int, List[ModuleResult]]:
+    """Build the overall score and module results for one hash bucket (they only depend on the bucket)"""
     base_score = 60 + (url_hash % 40)  # 60-100 range
     
+    # Only the score differs between buckets
     modules = [
         ModuleResult(
-            name="SEO & Metadata",
-            score=min(100, base_score + 5),
-            description="Search engine optimization and meta tags analysis",
-            explanation="SEO analysis shows good optimization with proper meta tags and content structure.",
-            recommendations=[
-                Recommendation(
-                    priority="Medium",
-                    title="Optimize Meta Description",
-                    message="Consider improving meta description length for better search results display.",
-                    code_snippet='<meta name="description" content="Optimized description (120-160 chars)">',
-                    doc_link="https://developers.google.com/search/docs/appearance/snippet"
-                )
-            ]
-        ),
-        ModuleResult(
-            name="Performance",
-            score=min(100, base_score - 10),
-            description="Website speed and performance metrics",
-            explanation="Performance analysis shows room for improvement in loading speed and optimization.",
-            recommendations=[
-                Recommendation(
-                    priority="High",
-                    title="Optimize Images",
-                    message="Compress and properly format images to reduce loading times.",
-                    code_snippet='<img src="image.webp" alt="Description" loading="lazy">',
-                    doc_link="https://web.dev/fast/#optimize-your-images"
-                )
-            ]
-        ),
-        ModuleResult(
-            name="Security",
-            score=min(100, base_score + 15),
-            description="HTTPS and security implementation",
-            explanation="Security analysis shows good HTTPS implementation with room for header improvements.",
-            recommendations=[
-                Recommendation(
-                    priority="Medium",
-                    title="Add Security Headers",
-                    message="Implement additional security headers for better protection.",
-                    code_snippet="Strict-Transport-Security: max-age=31536000; includeSubDomains",
-                    doc_link="https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers#security"
-                )
-            ]
-        ),
-        ModuleResult(
-            name="Mobile Friendliness",
-            score=min(100, base_score + 8),
-            description="Mobile device compatibility and usability",
-            explanation="Mobile analysis shows good responsive design with minor optimization opportunities.",
-            recommendations=[
-                Recommendation(
-                    priority="Low",
-                    title="Optimize Touch Targets",
-                    message="Ensure all interactive elements are properly sized for touch interaction.",
-                    code_snippet='.touch-target { min-height: 44px; min-width: 44px; }',
-                    doc_link="https://web.dev/accessible-tap-targets/"
-                )
-            ]
-        ),
-        ModuleResult(
-            name="Crawlability",
-            score=min(100, base_score - 5),
-            description="Search engine crawling accessibility",
-            explanation="Crawlability analysis shows good structure with some areas for improvement.",
-            recommendations=[
-                Recommendation(
-                    priority="Medium",
-                    title="Optimize Robots.txt",
-                    message="Review and optimize robots.txt file for better crawling guidance.",
-                    code_snippet="User-agent: *\nAllow: /\nSitemap: https://yoursite.com/sitemap.xml",
-                    doc_link="https://developers.google.com/search/docs/crawling-indexing/robots/intro"
-                )
-            ]
-        ),
-        ModuleResult(
-            name="Indexing",
-            score=min(100, base_score + 2),
-            description="Search engine indexing optimization",
-            explanation="Indexing analysis shows proper setup with opportunities for canonical tag optimization.",
-            recommendations=[
-                Recommendation(
-                    priority="Medium",
-                    title="Add Canonical Tags",
-                    message="Implement canonical tags to prevent duplicate content issues.",
-                    code_snippet='<link rel="canonical" href="https://example.com/preferred-url">',
-                    doc_link="https://developers.google.com/search/docs/crawling-indexing/consolidate-duplicate-urls"
-                )
-            ]
+            name=name,
+            score=min(100, base_score + offset),
+            description=description,
+            explanation=explanation,
+            recommendations=[recommendation]
         )
+        for name, offset, description, explanation, recommendation in _MODULE_SPECS
     ]
     
     overall_score = sum(m.score for m in modules) // len(modules)
     
+    return overall_score, modules
+
+def generate_mock_analysis(url: str) -> AnalysisResult:
+    """Generate mock analysis results for testing"""
+    
+    # Simple hash-based scoring for consistency; only 100 distinct results exist, so they are cached
+    url_hash = hash(url) % 100
+    overall_score, modules = _mock_template(url_hash)
+    
     return AnalysisResult(
         url=url,
         timestamp=datetime.now().isoformat(),
@@ -168,19 +194,21 @@ async def root():
         }
     }
 
-@app.post("/analyze", response_model=AnalysisResult)
+# AnalysisResult is documented via responses= but not re-validated; the handler serializes it itself
+@app.post("/analyze", responses={200: {"model": AnalysisResult}})
 async def analyze_website(request: AnalysisRequest):
     try:
         logger.info(f"Analyzing website: {request.url}")
         
-        # Simulate analysis time
-        await asyncio.sleep(1)
+        # Simulate analysis time (opt-in)
+        if SIMULATE_DELAY_MS > 0:
+            await asyncio.sleep(SIMULATE_DELAY_MS / 1000)
         
         # Generate mock analysis
         result = generate_mock_analysis(request.url)
         
         logger.info(f"Analysis completed for {request.url} with score {result.overall_score}%")
-        return result
+        return Response(content=result.model_dump_json(), media_type="application/json")
         
     except Exception as e:
         logger.error(f"Analysis failed for {request.url}: {e}")